@@ -106,4 +106,8 @@ TELEGRAM_CONFIG = {
     'SEND_ONLY_HIGH_QUALITY': True,    # Отправлять только высококачественные сигналы
     'MIN_CONFIDENCE_TO_SEND': 0.75,    # Минимальная уверенность для отправки
     'INCLUDE_REJECTION_STATS': True,   # Включать статистику отклонений
-}
\ No newline at end of file
+}
+
+# Объединять несколько готовых сигналов цикла в одно Telegram-сообщение
+# (меньше запросов к API, нет риска упереться в лимит 30 msg/s)
+TELEGRAM_BATCH = True
\ No newline at end of file
@@ -1,8 +1,21 @@
+import atexit
 import logging
+import logging.handlers
+import queue
 import sys
 import os
 from datetime import datetime
 
+# Буферизующий обработчик файла лога (MemoryHandler поверх FileHandler).
+# Хранится на уровне модуля, чтобы можно было явно сбросить буфер
+# при аварийном завершении (см. flush_log_buffers).
+_memory_handler = None
+
+# Фоновый поток записи логов: вызовы logger.* кладут запись в очередь
+# (QueueHandler), а QueueListener пишет в файл из отдельного потока -
+# event loop не блокируется на дисковом I/O.
+_queue_listener = None
+
 class UTFFormatter(logging.Formatter):
     """Форматтер с поддержкой UTF-8 и безопасным выводом эмодзи"""
     
@@ -46,9 +59,35 @@ class UTFFormatter(logging.Formatter):
         
         return formatted
 
+def flush_log_buffers():
+    """Принудительный сброс буфера файлового лога на диск"""
+    global _queue_listener
+    if _queue_listener is not None:
+        try:
+            # stop() дожидается опустошения очереди и закрывает поток;
+            # flushOnClose у MemoryHandler дописывает остаток буфера
+            _queue_listener.stop()
+        except Exception:
+            pass
+        _queue_listener = None
+    if _memory_handler is not None:
+        try:
+            _memory_handler.flush()
+        except Exception:
+            pass
+
 def setup_logging():
     """Настройка логирования с поддержкой UTF-8"""
-    
+    global _memory_handler, _queue_listener
+
+    # Останавливаем предыдущий поток записи при повторной настройке
+    if _queue_listener is not None:
+        try:
+            _queue_listener.stop()
+        except Exception:
+            pass
+        _queue_listener = None
+
     # Создаем директорию для логов если не существует
     log_dir = 'logs'
     if not os.path.exists(log_dir):
@@ -70,11 +109,30 @@ def setup_logging():
     # Очищаем существующие обработчики
     logger.handlers.clear()
     
-    # Файловый обработчик
+    # Файловый обработчик за буфером в памяти: записи копятся пачками
+    # и пишутся на диск одним write() при заполнении буфера или при
+    # ERROR - вместо отдельного syscall на каждую запись лога
     file_handler = logging.FileHandler(log_filename, encoding='utf-8')
     file_handler.setLevel(logging.INFO)
     file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
+
+    _memory_handler = logging.handlers.MemoryHandler(
+        capacity=1024,
+        flushLevel=logging.ERROR,
+        target=file_handler,
+        flushOnClose=True
+    )
+    _memory_handler.setLevel(logging.INFO)
+
+    # Вызовы логирования только кладут запись в очередь (~микросекунда),
+    # вся файловая запись уходит в фоновый daemon-поток
+    log_queue = queue.SimpleQueue()
+    _queue_listener = logging.handlers.QueueListener(
+        log_queue, _memory_handler, respect_handler_level=True
+    )
+    _queue_listener.start()
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    atexit.register(flush_log_buffers)
     
     # Консольный обработчик
     console_handler = logging.StreamHandler(sys.stdout)
@@ -18,10 +18,19 @@ class BybitFuturesAPI:
     
     BASE_URL = "https://api.bybit.com"
     
-    def __init__(self):
-        self.session = aiohttp.ClientSession()
+    def __init__(self, connector=None):
+        # Можно передать общий TCPConnector (например, один на Bybit и
+        # Telegram) - меньше TLS-рукопожатий, соединения остаются теплыми.
+        # Сессия становится владельцем коннектора и закроет его сама.
+        if connector is None:
+            # Пул keep-alive соединений: параллельные запросы идут по уже
+            # открытым сокетам вместо нового TLS-рукопожатия на каждый
+            connector = aiohttp.TCPConnector(limit=64, limit_per_host=32)
+        self.session = aiohttp.ClientSession(connector=connector)
         self.last_request_time = 0
         self.request_interval = 0.1
+        # Ограничитель параллелизма для пакетных запросов (fetch_many)
+        self._batch_semaphore = asyncio.Semaphore(32)
     
     async def __aenter__(self):
         return self
@@ -92,6 +101,31 @@ class BybitFuturesAPI:
         
         return pd.DataFrame()
     
+    async def get_ohlcv_many(self, requests) -> list:
+        """Пакетное получение OHLCV: все запросы уходят параллельно
+        через общий пул соединений под семафором.
+
+        requests - список кортежей (symbol, interval, limit).
+        Возвращает список DataFrame в том же порядке; ошибка по одному
+        запросу дает пустой DataFrame, не ломая остальные.
+        """
+        async def fetch_one(symbol, interval, limit):
+            async with self._batch_semaphore:
+                return await self.get_ohlcv(symbol, interval, limit)
+
+        results = await asyncio.gather(
+            *(fetch_one(*req) for req in requests),
+            return_exceptions=True
+        )
+
+        dataframes = []
+        for req, result in zip(requests, results):
+            if isinstance(result, Exception):
+                logger.error(f"Ошибка пакетного запроса OHLCV {req[0]}: {result}")
+                result = pd.DataFrame()
+            dataframes.append(result)
+        return dataframes
+
     async def get_current_price(self, symbol: str) -> float:
         """Получение текущей цены с повышенной точностью"""
         endpoint = "/v5/market/tickers"
@@ -4,6 +4,7 @@
 ЭТАП 1.2: Ожидаемое улучшение +15% к винрейту
 """
 
+import asyncio
 import pandas as pd
 import numpy as np
 import logging
@@ -29,6 +30,9 @@ class HybridTradingEngineV2:
         self.antispam = AntiSpamFilter()
         self.level_calculator = SmartLevelCalculator()
         self.timing_manager = SmartTimingManager()  # НОВЫЙ компонент
+        # Защита pending_entries: генерация сигналов и проверка входов
+        # могут выполняться конкурентно в одном цикле
+        self._timing_lock = asyncio.Lock()
         self.ml_enabled = False
         
         # Статистика timing
@@ -59,9 +63,23 @@ class HybridTradingEngineV2:
             logger.debug(f"Торговля запрещена в текущий час: {datetime.now().hour}")
             return new_signals
         
-        for symbol in symbols:
+        # Символы независимы - анализируем параллельно, ограничив число
+        # одновременных запросов к API семафором: время цикла перестает
+        # расти линейно с количеством символов
+        semaphore = asyncio.Semaphore(16)
+
+        async def analyze_one(symbol):
+            async with semaphore:
+                return await self._analyze_single_symbol(symbol)
+
+        results = await asyncio.gather(*(analyze_one(s) for s in symbols),
+                                       return_exceptions=True)
+
+        # Постобработка (timing очередь, статистика, логи) - последовательно
+        for symbol, signal in zip(symbols, results):
             try:
-                signal = await self._analyze_single_symbol(symbol)
+                if isinstance(signal, Exception):
+                    raise signal
                 if signal and signal.get('direction'):
                     self.timing_stats['signals_generated'] += 1
                     
@@ -69,7 +87,8 @@ class HybridTradingEngineV2:
                     timing_strategy = self._select_timing_strategy(signal)
                     
                     # Добавляем сигнал в менеджер timing вместо немедленного входа
-                    pending = self.timing_manager.add_signal_for_timing(signal, timing_strategy)
+                    async with self._timing_lock:
+                        pending = self.timing_manager.add_signal_for_timing(signal, timing_strategy)
                     self.timing_stats['signals_pending'] += 1
                     
                     logger.info(f"📊 Новый сигнал добавлен в очередь timing: {symbol} {signal['direction']} "
@@ -89,7 +108,8 @@ class HybridTradingEngineV2:
     
     async def check_ready_entries(self):
         """Проверяет готовые к входу сигналы"""
-        ready_entries = await self.timing_manager.check_pending_entries(self.api)
+        async with self._timing_lock:
+            ready_entries = await self.timing_manager.check_pending_entries(self.api)
         processed_entries = []
         
         for entry_signal in ready_entries:
@@ -163,12 +183,15 @@ class HybridTradingEngineV2:
     async def _analyze_single_symbol(self, symbol):
         """Анализ одного символа (копия из предыдущей версии с небольшими улучшениями)"""
         try:
-            # Сбор данных
+            # Сбор данных: все таймфреймы одним параллельным залпом
+            # (4·RTT превращается в ~1·RTT на пуле keep-alive соединений)
             from config import LIMIT
-            data_1m = await self.api.get_ohlcv(symbol, 1, min(LIMIT, 100))
-            data_15m = await self.api.get_ohlcv(symbol, 15, LIMIT)
-            data_30m = await self.api.get_ohlcv(symbol, 30, LIMIT)
-            data_1h = await self.api.get_ohlcv(symbol, 60, min(LIMIT//2, 200))
+            data_1m, data_15m, data_30m, data_1h = await self.api.get_ohlcv_many([
+                (symbol, 1, min(LIMIT, 100)),
+                (symbol, 15, LIMIT),
+                (symbol, 30, LIMIT),
+                (symbol, 60, min(LIMIT // 2, 200)),
+            ])
             
             if data_15m.empty or data_30m.empty:
                 return None
@@ -1,18 +1,17 @@
 import aiohttp
 import pandas as pd
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 import asyncio
 import logging
+import random
 import time
 import os
 from datetime import datetime, timedelta, timezone
-from ta.momentum import RSIIndicator
-from ta.volatility import BollingerBands
-from ta.volume import VolumeWeightedAveragePrice, OnBalanceVolumeIndicator
-from ta.trend import MACD
-from sklearn.preprocessing import StandardScaler
 import json
-import pytz
+
+# Тяжёлые библиотеки (ta, sklearn) импортируются лениво внутри
+# generate_features: чистая загрузка данных стартует быстрее и легче
 
 # Настройка логирования
 logging.basicConfig(
@@ -33,6 +32,10 @@ CONFIG = {
     "DATA_DIR": 'historical_data',
     "MAX_RETRIES": 5,
     "REQUEST_INTERVAL": 0.3,
+    "RETRY_BACKOFF_BASE": 0.5,   # стартовая задержка decorrelated jitter, сек
+    "RETRY_BACKOFF_CAP": 30,     # потолок задержки, сек
+    "RETRY_BUDGET": 50,          # общий лимит повторов на все задачи
+    "RETRY_REFILL_INTERVAL": 60, # период пополнения бюджета, сек
     "FEATURE_CONFIG": {
         "rsi_window": 14,
         "bb_window": 20,
@@ -48,6 +51,10 @@ CONFIG = {
 
 os.makedirs(CONFIG["DATA_DIR"], exist_ok=True)
 
+# Константы запросов создаются один раз, а не на каждый вызов
+REQUEST_TIMEOUT = aiohttp.ClientTimeout(total=15)
+STATIC_HEADERS = {"Accept": "application/json"}
+
 class EnhancedDataFetcher:
     BASE_URL = "https://api.bybit.com"
     
@@ -56,11 +63,28 @@ class EnhancedDataFetcher:
         self.last_request_time = 0
         self.request_interval = CONFIG["REQUEST_INTERVAL"]
         self.data_quality_report = []
-    
+        # Общий бюджет повторов: падающий эндпоинт не может занять
+        # все слоты задач бесконечными ретраями
+        self.retry_budget = asyncio.BoundedSemaphore(CONFIG["RETRY_BUDGET"])
+        self._refill_task = None
+
+    async def _refill_retry_budget(self):
+        """Фоновое пополнение бюджета повторов"""
+        while True:
+            await asyncio.sleep(CONFIG["RETRY_REFILL_INTERVAL"])
+            for _ in range(CONFIG["RETRY_BUDGET"]):
+                try:
+                    self.retry_budget.release()
+                except ValueError:
+                    break  # бюджет уже полон
+
     async def __aenter__(self):
+        self._refill_task = asyncio.ensure_future(self._refill_retry_budget())
         return self
-    
+
     async def __aexit__(self, exc_type, exc, tb):
+        if self._refill_task:
+            self._refill_task.cancel()
         await self.session.close()
         # Сохраняем отчет о качестве данных
         report_file = f"{CONFIG['DATA_DIR']}/data_quality_report_{datetime.now().strftime('%Y%m%d')}.json"
@@ -86,7 +110,8 @@ class EnhancedDataFetcher:
         # Улучшенный механизм повторных попыток
         retries = 0
         max_retries = CONFIG["MAX_RETRIES"]
-        
+        backoff = CONFIG["RETRY_BACKOFF_BASE"]
+
         while retries <= max_retries:
             elapsed = time.time() - self.last_request_time
             if elapsed < self.request_interval:
@@ -97,8 +122,8 @@ class EnhancedDataFetcher:
             
             try:
                 async with self.session.request(
-                    method, url, 
-                    timeout=aiohttp.ClientTimeout(total=15),
+                    method, url,
+                    timeout=REQUEST_TIMEOUT,
                     **kwargs
                 ) as response:
                     if response.status == 429:
@@ -115,28 +140,70 @@ class EnhancedDataFetcher:
                     logger.error(f"Не удалось выполнить запрос после {max_retries} попыток")
                     return None
                 retries += 1
-                await asyncio.sleep(2 ** retries)  # Экспоненциальная задержка
+                # Decorrelated jitter: случайная задержка рассинхронизирует
+                # повторы конкурентных задач после сбоя
+                backoff = min(CONFIG["RETRY_BACKOFF_CAP"],
+                              random.uniform(CONFIG["RETRY_BACKOFF_BASE"], backoff * 3))
+                await self.retry_budget.acquire()
+                await asyncio.sleep(backoff)
             except Exception as e:
                 logger.error(f"Критическая ошибка: {str(e)}")
                 return None
         return None
-    
-    async def fetch_ohlcv(self, symbol: str, interval: int, start_time: int = None, end_time: int = None, limit: int = 1000) -> pd.DataFrame:
-        """Получение исторических данных OHLCV с улучшенной обработкой"""
-        endpoint = "/v5/market/kline"
-        params = {
-            "category": "linear",
-            "symbol": symbol,
-            "interval": interval,
-            "limit": limit
-        }
-        
+
+    async def _fetch_kline(self, symbol, interval, start_time=None, end_time=None, limit=1000):
+        """Специализированный GET к /v5/market/kline.
+
+        Строка запроса собирается f-строкой без словаря параметров,
+        таймаут и заголовки — общие константы модуля: убирает накладные
+        расходы на конструирование запроса при тысячах мелких вызовов.
+        """
+        url = (f"{self.BASE_URL}/v5/market/kline?category=linear"
+               f"&symbol={symbol}&interval={interval}&limit={limit}")
         if start_time:
-            params["start"] = start_time
+            url += f"&start={start_time}"
         if end_time:
-            params["end"] = end_time
-        
-        data = await self._rate_limited_request("GET", endpoint, params=params)
+            url += f"&end={end_time}"
+
+        retries = 0
+        max_retries = CONFIG["MAX_RETRIES"]
+        backoff = CONFIG["RETRY_BACKOFF_BASE"]
+
+        while retries <= max_retries:
+            elapsed = time.time() - self.last_request_time
+            if elapsed < self.request_interval:
+                await asyncio.sleep(self.request_interval - elapsed)
+
+            self.last_request_time = time.time()
+
+            try:
+                async with self.session.get(url, headers=STATIC_HEADERS, timeout=REQUEST_TIMEOUT) as response:
+                    if response.status == 429:
+                        retry_after = int(response.headers.get('Retry-After', 5))
+                        logger.warning(f"Rate limit exceeded. Retrying after {retry_after} seconds")
+                        await asyncio.sleep(retry_after)
+                        continue
+
+                    response.raise_for_status()
+                    return await response.json()
+            except aiohttp.ClientError as e:
+                logger.warning(f"Сетевая ошибка ({retries}/{max_retries}): {str(e)}")
+                if retries >= max_retries:
+                    logger.error(f"Не удалось выполнить запрос после {max_retries} попыток")
+                    return None
+                retries += 1
+                backoff = min(CONFIG["RETRY_BACKOFF_CAP"],
+                              random.uniform(CONFIG["RETRY_BACKOFF_BASE"], backoff * 3))
+                await self.retry_budget.acquire()
+                await asyncio.sleep(backoff)
+            except Exception as e:
+                logger.error(f"Критическая ошибка: {str(e)}")
+                return None
+        return None
+
+    async def fetch_ohlcv(self, symbol: str, interval: int, start_time: int = None, end_time: int = None, limit: int = 1000) -> pd.DataFrame:
+        """Получение исторических данных OHLCV с улучшенной обработкой"""
+        data = await self._fetch_kline(symbol, interval, start_time=start_time, end_time=end_time, limit=limit)
         
         if not data:
             logger.error(f"Пустой ответ для {symbol}-{interval}мин")
@@ -280,61 +347,74 @@ class EnhancedDataFetcher:
         }
     
     async def fetch_multiple(self, symbols, timeframes, days=30):
-        """Параллельный сбор данных"""
+        """Параллельный сбор данных без удержания всех DataFrame в памяти.
+
+        Каждая задача сама сохраняет свой parquet-файл, поэтому вместо
+        gather + concat обрабатываем результаты по мере готовности и
+        возвращаем только сводку (счётчики и пути к файлам).
+        """
         tasks = []
         for symbol in symbols:
             for tf in timeframes:
                 logger.info(f"Добавлена задача: {symbol}-{tf}мин за {days} дней")
-                tasks.append(self.fetch_and_process(symbol, tf, days))
-        
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        valid_results = []
-        
-        for res in results:
-            if isinstance(res, Exception):
-                logger.error(f"Ошибка в задаче: {str(res)}")
-            elif not res.empty:
-                valid_results.append(res)
-        
-        return pd.concat(valid_results) if valid_results else pd.DataFrame()
-    
+                tasks.append(asyncio.ensure_future(self.fetch_and_process(symbol, tf, days)))
+
+        summary = {"total": len(tasks), "completed": 0, "failed": 0, "files": []}
+
+        for coro in asyncio.as_completed(tasks):
+            try:
+                filename = await coro
+            except Exception as e:
+                logger.error(f"Ошибка в задаче: {str(e)}")
+                summary["failed"] += 1
+                continue
+
+            if filename:
+                summary["completed"] += 1
+                summary["files"].append(filename)
+            else:
+                summary["failed"] += 1
+
+        logger.info(f"Готово задач: {summary['completed']}/{summary['total']}")
+        return summary
+
     async def fetch_and_process(self, symbol, tf, days):
-        """Обработка одного набора данных"""
+        """Обработка одного набора данных, возвращает путь к parquet-файлу"""
         logger.info(f"Запуск загрузки: {symbol}-{tf}мин")
-        
+
         try:
             df = await self.fetch_ohlcv_period(symbol, tf, days)
             if df.empty:
                 logger.warning(f"Пустые данные для {symbol}-{tf}мин")
-                return pd.DataFrame()
-            
+                return None
+
             # Генерация фичей
             df = self.generate_features(df, tf)
-            
+
             if df.empty:
                 logger.warning(f"После генерации фичей данные пусты для {symbol}-{tf}мин")
-                return pd.DataFrame()
-            
+                return None
+
             # Сохранение данных
             filename_prefix = f"{CONFIG['DATA_DIR']}/{symbol}_{tf}min_{days}days_{datetime.now().strftime('%Y%m%d')}"
-            
+
             # Parquet
             parquet_filename = f"{filename_prefix}.parquet"
             df.to_parquet(parquet_filename)
             logger.info(f"Сохранено {len(df)} свечей в {parquet_filename}")
-            
+
             # Даты
             txt_filename = f"{filename_prefix}_dates.txt"
             self.save_dates_to_txt(df, txt_filename)
-            
+
             # Метаданные
             meta_filename = f"{filename_prefix}_meta.json"
             self.save_metadata(df, meta_filename)
-            
-            return df
+
+            return parquet_filename
         except Exception as e:
             logger.exception(f"Ошибка обработки {symbol}-{tf}мин: {str(e)}")
-            return pd.DataFrame()
+            return None
     
     def save_dates_to_txt(self, df, filename):
         """Сохранение списка дат"""
@@ -378,11 +458,25 @@ class EnhancedDataFetcher:
         if df.empty or len(df) < 100:
             logger.warning(f"Недостаточно данных для генерации фичей: {len(df)} строк")
             return df
-        
+
+        # Ленивый импорт индикаторов и скейлера
+        from ta.momentum import RSIIndicator
+        from ta.volatility import BollingerBands
+        from ta.volume import VolumeWeightedAveragePrice, OnBalanceVolumeIndicator
+        from ta.trend import MACD
+        from sklearn.preprocessing import StandardScaler
+
         try:
             # Основные преобразования
             df['returns'] = df['close'].pct_change()
-            df['volatility'] = df['returns'].rolling(20).std()
+            # Скользящее std через sliding_window_view: view без копий,
+            # редукция по оси уходит в векторизованный C-цикл numpy
+            returns = df['returns'].to_numpy()
+            vol = np.full_like(returns, np.nan)
+            if len(returns) >= 20:
+                windows = sliding_window_view(returns, 20)
+                vol[19:] = windows.std(axis=1, ddof=1)
+            df['volatility'] = vol
             df['high_low_spread'] = (df['high'] - df['low']) / df['open']
             
             # 1. Momentum индикаторы
@@ -429,9 +523,15 @@ class EnhancedDataFetcher:
                 logger.error(f"Ошибка генерации MACD: {str(e)}")
             
             # 6. Циклические фичи
-            df['hour'] = df['timestamp'].dt.hour
-            df['day_of_week'] = df['timestamp'].dt.dayofweek
-            df['month'] = df['timestamp'].dt.month
+            # Целочисленная арифметика на int64 ns вместо .dt-аксессора:
+            # один проход без создания Timestamp-объектов, столбцы в int8
+            ts_ns = df['timestamp'].values.astype('datetime64[ns]').view('int64')
+            seconds = ts_ns // 1_000_000_000
+            df['hour'] = ((seconds // 3600) % 24).astype(np.int8)
+            # Эпоха 1970-01-01 — четверг (dayofweek=3 у pandas, пн=0)
+            df['day_of_week'] = (((seconds // 86400) + 3) % 7).astype(np.int8)
+            df['month'] = (ts_ns.view('datetime64[ns]').astype('datetime64[M]')
+                           .astype(np.int64) % 12 + 1).astype(np.int8)
             
             # 7. Ценовые действия
             df['body_size'] = (df['close'] - df['open']) / df['open']
@@ -4,10 +4,11 @@
 ЭТАП 1.2: Ожидаемое улучшение +15% к винрейту
 """
 
+import aiohttp
 import asyncio
 import logging
-import time
-from datetime import datetime
+from collections import deque
+from time import monotonic_ns
 
 # Импорт конфигурации логирования  
 from config.logging_config import setup_logging
@@ -15,12 +16,16 @@ from config.logging_config import setup_logging
 # Настройка логирования
 logger = setup_logging()
 
-print("🚀 Запуск системы с УЛУЧШЕННЫМ TIMING...")
-print("🎯 Режим: Умный timing входа - ждем оптимальные моменты")
-print("📋 Инициализация модулей...")
+# Разделитель цикла в логах
+_BAR = "=" * 70
+
+# Один write/flush вместо трех - заметно под Docker-логгером
+print("🚀 Запуск системы с УЛУЧШЕННЫМ TIMING...\n"
+      "🎯 Режим: Умный timing входа - ждем оптимальные моменты\n"
+      "📋 Инициализация модулей...", flush=True)
 
 # Импорт основных компонентов
-from config import SYMBOLS, INTERVAL_SEC
+from config import SYMBOLS, INTERVAL_SEC, TELEGRAM_BATCH
 from core import BybitFuturesAPI
 from core.trading_engine import HybridTradingEngineV2  # Новая версия с timing
 from utils import display_signal, display_startup_info
@@ -35,18 +40,84 @@ except ImportError as e:
     print(f"❌ Ошибка загрузки Telegram модуля: {e}")
     create_telegram_bot = None
 
+class _DummyBot:
+    """Заглушка context manager'а, когда Telegram не настроен"""
+    enabled = False
+    async def __aenter__(self): return self
+    async def __aexit__(self, *args): pass
+
+_DUMMY_BOT = _DummyBot()
+
+# Максимум элементов очереди, отправляемых одним заходом фонового отправителя
+TELEGRAM_SENDER_BATCH = 10
+# Сколько ждем добора элементов перед отправкой, сек
+TELEGRAM_SENDER_LINGER = 0.5
+
+async def telegram_sender(tg_bot, tg_queue, tg_wakeup):
+    """Фоновый отправитель Telegram.
+
+    Основной цикл только кладет payload'ы в очередь и не ждет сеть:
+    медленный ответ Telegram (429, таймаут) больше не задерживает
+    следующий опрос Bybit. Очередь - обычный deque: append/popleft без
+    аллокации Future на каждый элемент (в отличие от asyncio.Queue);
+    tg_wakeup будит отправителя один раз на волну сообщений. Элементы
+    добираются пачками до TELEGRAM_SENDER_BATCH штук, с паузой
+    TELEGRAM_SENDER_LINGER на добор хвоста волны.
+    """
+    while True:
+        if not tg_queue:
+            tg_wakeup.clear()
+            await tg_wakeup.wait()
+
+        # Даем волне собраться: основной цикл кладет сообщения пачкой
+        if len(tg_queue) < TELEGRAM_SENDER_BATCH:
+            await asyncio.sleep(TELEGRAM_SENDER_LINGER)
+
+        items = []
+        while tg_queue and len(items) < TELEGRAM_SENDER_BATCH:
+            items.append(tg_queue.popleft())
+
+        try:
+            # Копия сигнала и timing_details строятся здесь, в фоне,
+            # а не в горячем цикле анализа
+            signals = [build_enhanced_signal(item['signal'])
+                       for item in items if item['kind'] == 'signal']
+
+            if signals:
+                if TELEGRAM_BATCH:
+                    for chunk in format_batched_timing(signals):
+                        await tg_bot.send_message(chunk, parse_mode='HTML')
+                else:
+                    results = await asyncio.gather(
+                        *[tg_bot.send_timing_signal(s) for s in signals],
+                        return_exceptions=True
+                    )
+                    for signal, success in zip(signals, results):
+                        if isinstance(success, Exception) or not success:
+                            logger.warning("⚠️ Не удалось отправить timing сигнал %s", signal['symbol'])
+
+            for item in items:
+                if item['kind'] == 'system':
+                    await tg_bot.send_system_message(item['title'], item['text'], item['emoji'])
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            # Узкий перехват: отмена (CancelledError) проходит наружу,
+            # а неожиданные баги не глушатся молча
+            logger.error("❌ Ошибка фоновой отправки в Telegram: %s", e)
+
 async def main_loop_v2():
     """Основной цикл системы с timing"""
-    print("=" * 70)
-    print("🎯 СИСТЕМА С УЛУЧШЕННЫМ TIMING ВХОДА")
-    print("=" * 70)
-    print("🚀 Новые возможности:")
-    print("   • Pullback стратегия - ждем лучшие цены входа")
-    print("   • Микро-подтверждения перед входом")
-    print("   • Breakout подтверждения с объемом")
-    print("   • Адаптивный timing для разных типов сигналов")
-    print("   • Детальная статистика timing")
-    print("=" * 70)
+    print("\n".join([
+        _BAR,
+        "🎯 СИСТЕМА С УЛУЧШЕННЫМ TIMING ВХОДА",
+        _BAR,
+        "🚀 Новые возможности:",
+        "   • Pullback стратегия - ждем лучшие цены входа",
+        "   • Микро-подтверждения перед входом",
+        "   • Breakout подтверждения с объемом",
+        "   • Адаптивный timing для разных типов сигналов",
+        "   • Детальная статистика timing",
+        _BAR,
+    ]), flush=True)
     
     display_startup_info()
     
@@ -54,13 +125,17 @@ async def main_loop_v2():
     print("\n🤖 ИНИЦИАЛИЗАЦИЯ TELEGRAM БОТА")
     print("=" * 50)
     
+    # Один пул соединений на Bybit и Telegram: меньше TLS-рукопожатий,
+    # теплые соединения между циклами. Владельцем станет сессия Bybit API.
+    shared_connector = aiohttp.TCPConnector(limit=100, ttl_dns_cache=300, keepalive_timeout=75)
+
     if create_telegram_bot is None:
         print("❌ Telegram модуль не загружен!")
         telegram_bot = None
         telegram_enabled = False
     else:
         print("🔄 Создаем Telegram бота...")
-        telegram_bot = create_telegram_bot()
+        telegram_bot = create_telegram_bot(connector=shared_connector)
         telegram_enabled = telegram_bot.enabled if telegram_bot else False
         
         print(f"📱 Telegram бот создан: enabled={telegram_enabled}")
@@ -74,18 +149,31 @@ async def main_loop_v2():
     print("=" * 50)
     
     # Создаем правильный context manager для Telegram
-    if telegram_bot and telegram_enabled:
-        tg_context = telegram_bot
-    else:
-        class DummyBot:
-            enabled = False
-            async def __aenter__(self): return self
-            async def __aexit__(self, *args): pass
-        tg_context = DummyBot()
+    tg_context = telegram_bot if (telegram_bot and telegram_enabled) else _DUMMY_BOT
     
-    async with BybitFuturesAPI() as api, tg_context as tg_bot:
+    async with BybitFuturesAPI(connector=shared_connector) as api, tg_context as tg_bot:
+        # Eager task factory (Python 3.12+): короткие корутины выполняются
+        # сразу до первой реальной приостановки, без лишнего планирования
+        if hasattr(asyncio, 'eager_task_factory'):
+            asyncio.get_running_loop().set_task_factory(asyncio.eager_task_factory)
+
         engine = HybridTradingEngineV2(api)  # Новый движок с timing
-        
+
+        # Локальные ссылки на методы логгера: убирают поиск атрибута
+        # на каждом из ~15 вызовов за цикл бесконечного цикла
+        log_info = logger.info
+        log_warn = logger.warning
+        log_error = logger.error
+
+        # Очередь исходящих Telegram-сообщений + фоновый отправитель:
+        # цикл анализа больше не ждет сеть Telegram. deque + Event вместо
+        # asyncio.Queue: одно пробуждение на волну, а не Future на элемент
+        tg_queue = deque()
+        tg_wakeup = asyncio.Event()
+        sender_task = None
+        if telegram_enabled and tg_bot.enabled:
+            sender_task = asyncio.create_task(telegram_sender(tg_bot, tg_queue, tg_wakeup))
+
         # Тестируем Telegram
         if telegram_enabled and tg_bot.enabled:
             print("🤖 Telegram бот включен, тестируем подключение...")
@@ -125,200 +213,256 @@ async def main_loop_v2():
         cycle_count = 0
         total_signals_generated = 0
         total_entries_executed = 0
-        
-        while True:
-            try:
-                cycle_count += 1
-                start_time = time.time()
-                
-                logger.info(f"\n{'='*70}")
-                logger.info(f"🔍 Цикл #{cycle_count}: Анализ + проверка готовых входов")
-                logger.info(f"⏰ Время: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-                
-                # ФАЗА 1: Генерация новых сигналов (добавляем в timing систему)
-                new_signals = await engine.analyze_and_generate_signals(SYMBOLS)
-                
-                if new_signals:
-                    total_signals_generated += len(new_signals)
-                    logger.info(f"📊 Новых сигналов добавлено в очередь timing: {len(new_signals)}")
-                    
-                    for signal_info in new_signals:
-                        signal = signal_info['signal']
-                        timing_strategy = signal_info['timing_strategy']
-                        
-                        logger.info(f"⏳ {signal['symbol']} {signal['direction']} "
-                                   f"(стратегия: {timing_strategy}, "
-                                   f"уверенность: {signal.get('confidence', 0):.1%})")
+        # Монотонные часы цикла: дешевле datetime.now() и не зависят от NTP;
+        # отметку времени в строку лога уже ставит logging-форматтер
+        loop_time = asyncio.get_running_loop().time
+        # Дрейф-корректный планировщик: целимся в фиксированную сетку тиков,
+        # а не в "работа + INTERVAL_SEC", иначе период растет с нагрузкой
+        next_tick = loop_time()
+
+        try:
+            while True:
+                try:
+                    cycle_count += 1
+                    start_ns = monotonic_ns()
+
+                    log_info("\n%s", _BAR)
+                    log_info(f"🔍 Цикл #{cycle_count}: Анализ + проверка готовых входов")
                 
-                # ФАЗА 2: Проверка готовых к входу сигналов
-                ready_entries = await engine.check_ready_entries()
+                    # ФАЗА 1 + ФАЗА 2 параллельно: генерация новых сигналов и
+                    # проверка готовых входов ходят за независимыми данными,
+                    # их сетевые запросы перекрываются
+                    new_signals, ready_entries = await asyncio.gather(
+                        engine.analyze_and_generate_signals(SYMBOLS),
+                        engine.check_ready_entries()
+                    )
+
+                    if new_signals:
+                        total_signals_generated += len(new_signals)
+                        log_info("📊 Новых сигналов добавлено в очередь timing: %d", len(new_signals))
+
+                        # Подробный перечень не форматируем, если INFO выключен
+                        if logger.isEnabledFor(logging.INFO):
+                            for signal_info in new_signals:
+                                signal = signal_info['signal']
+                                timing_strategy = signal_info['timing_strategy']
+
+                                log_info("⏳ %s %s (стратегия: %s, уверенность: %.1f%%)",
+                                            signal['symbol'], signal['direction'],
+                                            timing_strategy, signal.get('confidence', 0) * 100)
                 
-                if ready_entries:
-                    total_entries_executed += len(ready_entries)
-                    logger.info(f"🎯 Готовых к входу сигналов: {len(ready_entries)}")
-                    
-                    for entry_signal in ready_entries:
-                        # Отображение готового сигнала
-                        display_signal(entry_signal)
-                        
-                        # Отправка в Telegram
-                        if telegram_enabled and tg_bot.enabled:
-                            try:
-                                # Дополняем сообщение информацией о timing
-                                timing_info = entry_signal.get('timing_info', {})
-                                timing_type = timing_info.get('timing_type', 'unknown')
-                                wait_time = timing_info.get('wait_time_minutes', 0)
-                                entry_reason = timing_info.get('entry_reason', 'unknown')
-                                
-                                # Создаем улучшенное сообщение
-                                enhanced_signal = entry_signal.copy()
-                                enhanced_signal['timing_details'] = {
-                                    'strategy': timing_type,
-                                    'wait_time_minutes': wait_time,
-                                    'entry_reason': entry_reason,
-                                    'original_price': timing_info.get('original_signal_price', entry_signal['price'])
-                                }
-                                
-                                success = await tg_bot.send_timing_signal(enhanced_signal)
-                                if success:
-                                    print(f"🚀 TIMING сигнал {entry_signal['symbol']} отправлен в Telegram!")
-                                    logger.info(f"🚀 TIMING сигнал {entry_signal['symbol']} отправлен в Telegram")
-                                else:
-                                    print(f"❌ Не удалось отправить timing сигнал {entry_signal['symbol']}")
-                                    logger.warning(f"⚠️ Не удалось отправить timing сигнал {entry_signal['symbol']}")
-                            except Exception as e:
-                                print(f"❌ Ошибка отправки timing сигнала в Telegram: {str(e)}")
-                                logger.error(f"❌ Ошибка отправки timing сигнала в Telegram: {str(e)}")
+                    if ready_entries:
+                        total_entries_executed += len(ready_entries)
+                        log_info("🎯 Готовых к входу сигналов: %d", len(ready_entries))
+
+                        # Отображение готовых сигналов (синхронно, до отправки)
+                        for entry_signal in ready_entries:
+                            display_signal(entry_signal)
+
+                        # Отправка в Telegram: только кладем в очередь, сеть
+                        # обслуживает фоновый telegram_sender
+                        if sender_task is not None:
+                            for entry_signal in ready_entries:
+                                tg_queue.append({'kind': 'signal', 'signal': entry_signal})
+                            tg_wakeup.set()
+                            print(f"📨 {len(ready_entries)} timing сигналов поставлено в очередь Telegram")
+                            log_info("📨 %d timing сигналов поставлено в очередь Telegram", len(ready_entries))
                         else:
-                            print(f"🎯 TIMING сигнал {entry_signal['symbol']} готов (Telegram отключен)")
-                            logger.info(f"🎯 TIMING сигнал {entry_signal['symbol']} готов (Telegram отключен)")
-                
-                # ФАЗА 3: Получение статуса timing системы
-                timing_status = engine.get_timing_status()
-                pending_count = len(timing_status.get('pending_entries', []))
+                            for entry_signal in ready_entries:
+                                print(f"🎯 TIMING сигнал {entry_signal['symbol']} готов (Telegram отключен)")
+                                log_info("🎯 TIMING сигнал %s готов (Telegram отключен)", entry_signal['symbol'])
                 
-                # Краткая статистика цикла
-                cycle_time = time.time() - start_time
+                    # ФАЗА 3: Получение статуса timing системы
+                    timing_status = engine.get_timing_status()
+                    pending_count = len(timing_status.get('pending_entries', []))
                 
-                logger.info(f"\n📊 ЦИКЛ #{cycle_count} ЗАВЕРШЕН:")
-                logger.info(f"   🔍 Новых сигналов в очереди: {len(new_signals)}")
-                logger.info(f"   🎯 Готовых входов: {len(ready_entries)}")
-                logger.info(f"   ⏳ Ожидающих входов: {pending_count}")
-                logger.info(f"   ⏱️ Время цикла: {cycle_time:.1f} сек")
-                logger.info(f"   📈 Всего сигналов за сессию: {total_signals_generated}")
-                logger.info(f"   💼 Всего входов выполнено: {total_entries_executed}")
+                    # Краткая статистика цикла
+                    # Целочисленная монотонная метка: без плавающей точки до деления
+                    cycle_time = (monotonic_ns() - start_ns) / 1e9
                 
-                # Детальный статус pending entries каждые 10 циклов
-                if cycle_count % 10 == 0 and pending_count > 0:
-                    logger.info(f"\n⏳ ДЕТАЛИ ОЖИДАЮЩИХ ВХОДОВ:")
-                    for entry in timing_status.get('pending_entries', []):
-                        logger.info(f"   {entry['symbol']} {entry['direction'].upper()} "
-                                   f"| {entry['timing_type']} "
-                                   f"| Ждем: {entry['time_waiting']} "
-                                   f"| Подтв.: {entry['confirmations']}")
-                
-                logger.info(f"{'='*70}")
+                    log_info("\n📊 ЦИКЛ #%d ЗАВЕРШЕН:", cycle_count)
+                    log_info("   🔍 Новых сигналов в очереди: %d", len(new_signals))
+                    log_info("   🎯 Готовых входов: %d", len(ready_entries))
+                    log_info("   ⏳ Ожидающих входов: %d", pending_count)
+                    log_info("   ⏱️ Время цикла: %.1f сек", cycle_time)
+                    log_info("   📈 Всего сигналов за сессию: %d", total_signals_generated)
+                    log_info("   💼 Всего входов выполнено: %d", total_entries_executed)
+
+                    # Детальный статус pending entries каждые 10 циклов
+                    if cycle_count % 10 == 0 and pending_count > 0 and logger.isEnabledFor(logging.INFO):
+                        log_info("\n⏳ ДЕТАЛИ ОЖИДАЮЩИХ ВХОДОВ:")
+                        for entry in timing_status.get('pending_entries', []):
+                            log_info("   %s %s | %s | Ждем: %s | Подтв.: %s",
+                                        entry['symbol'], entry['direction'].upper(),
+                                        entry['timing_type'], entry['time_waiting'],
+                                        entry['confirmations'])
                 
-                # Пауза между циклами
-                await asyncio.sleep(INTERVAL_SEC)
+                    log_info(_BAR)
                 
-            except Exception as e:
-                print(f"❌ Ошибка в главном цикле: {str(e)}")
-                logger.error(f"Ошибка в главном цикле: {str(e)}")
+                    # Пауза до следующего тика сетки
+                    next_tick += INTERVAL_SEC
+                    delay = next_tick - loop_time()
+                    if delay < 0:
+                        log_warn("⚠️ Цикл #%d отстал от расписания на %.1f сек", cycle_count, -delay)
+                        next_tick = loop_time()
+                        delay = 0
+                    await asyncio.sleep(delay)
                 
-                # Уведомление об ошибке в Telegram
-                if telegram_enabled and tg_bot.enabled:
-                    try:
-                        await tg_bot.send_system_message(
-                            "Системная ошибка", 
-                            f"Произошла ошибка в цикле #{cycle_count}:\n<code>{str(e)}</code>",
-                            "🚨"
-                        )
-                        print("🚨 Уведомление об ошибке отправлено в Telegram")
-                        logger.info("🚨 Уведомление об ошибке отправлено в Telegram")
-                    except Exception as tg_error:
-                        print(f"❌ Не удалось отправить ошибку в Telegram: {str(tg_error)}")
-                        logger.error(f"❌ Не удалось отправить ошибку в Telegram: {str(tg_error)}")
+                except asyncio.CancelledError:
+                    # Отмена (Ctrl+C / shutdown) должна останавливать цикл,
+                    # а не попадать в generic-обработчик
+                    raise
+                except Exception as e:
+                    print(f"❌ Ошибка в главном цикле: {str(e)}")
+                    log_error("Ошибка в главном цикле: %s", e)
                 
-                await asyncio.sleep(30)
+                    # Уведомление об ошибке в Telegram - через ту же очередь
+                    if sender_task is not None:
+                        tg_queue.append({
+                            'kind': 'system',
+                            'title': "Системная ошибка",
+                            'text': f"Произошла ошибка в цикле #{cycle_count}:\n<code>{str(e)}</code>",
+                            'emoji': "🚨"
+                        })
+                        tg_wakeup.set()
+                        print("🚨 Уведомление об ошибке поставлено в очередь Telegram")
+                        log_info("🚨 Уведомление об ошибке поставлено в очередь Telegram")
 
-async def send_timing_signal(tg_bot, signal):
-    """Отправляет сигнал с timing информацией в Telegram"""
-    try:
-        timing_details = signal.get('timing_details', {})
-        
-        # Формируем сообщение с timing информацией
-        symbol = signal['symbol']
-        direction = signal['direction'].upper()
-        price = signal['price']
-        confidence = signal.get('confidence', 0)
-        
-        # Timing детали
-        strategy = timing_details.get('strategy', 'unknown')
-        wait_time = timing_details.get('wait_time_minutes', 0)
-        entry_reason = timing_details.get('entry_reason', 'unknown')
-        original_price = timing_details.get('original_price', price)
-        
-        # Рассчитываем улучшение цены
-        if direction == 'BUY':
-            price_improvement = ((original_price - price) / original_price) * 100
-            improvement_text = f"👍 Лучше на {price_improvement:.2f}%" if price_improvement > 0 else ""
+                    await asyncio.sleep(30)
+        finally:
+            # Даем фоновому отправителю дослать очередь и гасим его
+            if sender_task is not None:
+                try:
+                    deadline = loop_time() + 5
+                    while tg_queue and loop_time() < deadline:
+                        await asyncio.sleep(0.1)
+                except asyncio.CancelledError:
+                    pass
+                sender_task.cancel()
+
+def build_enhanced_signal(entry_signal):
+    """Дополняет готовый сигнал timing-информацией для Telegram"""
+    timing_info = entry_signal.get('timing_info', {})
+
+    enhanced_signal = entry_signal.copy()
+    enhanced_signal['timing_details'] = {
+        'strategy': timing_info.get('timing_type', 'unknown'),
+        'wait_time_minutes': timing_info.get('wait_time_minutes', 0),
+        'entry_reason': timing_info.get('entry_reason', 'unknown'),
+        'original_price': timing_info.get('original_signal_price', entry_signal['price'])
+    }
+    return enhanced_signal
+
+# Статический скелет сообщения парсится один раз на модуль;
+# на каждый сигнал выполняются только подстановки
+_TIMING_TPL = (
+    "🎯 <b>TIMING ВХОД ГОТОВ</b>\n"
+    "\n"
+    "📈 <b>{symbol}</b> - {direction}\n"
+    "💰 Цена входа: <code>{price}</code>\n"
+    "📊 Уверенность: <b>{confidence:.1%}</b>\n"
+    "\n"
+    "⏰ <b>Timing информация:</b>\n"
+    "• Стратегия: <i>{strategy}</i>\n"
+    "• Время ожидания: <i>{wait_time:.1f} мин</i>\n"
+    "• Причина входа: <i>{entry_reason}</i>\n"
+    "• Исходная цена: <code>{original_price}</code>\n"
+    "{improvement_text}\n"
+    "\n"
+    "🎚️ <b>Уровни:</b>\n"
+    "🛑 SL: <code>{stop_loss}</code>\n"
+    "🎯 TP1: <code>{tp1}</code>\n"
+    "🎯 TP2: <code>{tp2}</code>\n"
+    "🎯 TP3: <code>{tp3}</code>\n"
+    "\n"
+    "💡 <i>Timing система дождалась оптимального момента для входа!</i>"
+).format
+
+# Связанный format-метод: спецификация "$%.5f" парсится один раз,
+# а не на каждое из пяти ценовых полей каждого сигнала
+_PRICE_FMT = "${:.5f}".format
+
+def format_timing_block(signal):
+    """Формирует HTML-блок одного timing сигнала"""
+    timing_details = signal.get('timing_details', {})
+
+    direction = signal['direction'].upper()
+    price = signal['price']
+    original_price = timing_details.get('original_price', price)
+    tp1, tp2, tp3 = map(_PRICE_FMT, signal['take_profit'][:3])
+
+    # Рассчитываем улучшение цены: ветки BUY/SELL отличались только знаком
+    sign = 1.0 if direction == 'BUY' else -1.0
+    price_improvement = sign * (original_price - price) / original_price * 100.0
+    improvement_text = f"👍 Лучше на {price_improvement:.2f}%" if price_improvement > 0 else ""
+
+    return _TIMING_TPL(
+        symbol=signal['symbol'],
+        direction=direction,
+        price=_PRICE_FMT(price),
+        confidence=signal.get('confidence', 0),
+        strategy=timing_details.get('strategy', 'unknown'),
+        wait_time=timing_details.get('wait_time_minutes', 0),
+        entry_reason=timing_details.get('entry_reason', 'unknown'),
+        original_price=_PRICE_FMT(original_price),
+        improvement_text=improvement_text,
+        stop_loss=_PRICE_FMT(signal['stop_loss']),
+        tp1=tp1, tp2=tp2, tp3=tp3,
+    )
+
+# Telegram ограничивает сообщение 4096 символами - режем с запасом
+TELEGRAM_MESSAGE_LIMIT = 4000
+_BATCH_SEPARATOR = "\n\n━━━\n\n"
+
+def format_batched_timing(enhanced_signals):
+    """Объединяет сигналы цикла в минимальное число Telegram-сообщений"""
+    chunks = []
+    current = ""
+
+    for signal in enhanced_signals:
+        block = format_timing_block(signal)
+        candidate = current + _BATCH_SEPARATOR + block if current else block
+
+        if len(candidate) > TELEGRAM_MESSAGE_LIMIT and current:
+            chunks.append(current)
+            current = block
         else:
-            price_improvement = ((price - original_price) / original_price) * 100  
-            improvement_text = f"👍 Лучше на {price_improvement:.2f}%" if price_improvement > 0 else ""
-        
-        # Формируем сообщение
-        message = f"""
-🎯 <b>TIMING ВХОД ГОТОВ</b>
-
-📈 <b>{symbol}</b> - {direction}
-💰 Цена входа: <code>${price:.5f}</code>
-📊 Уверенность: <b>{confidence:.1%}</b>
-
-⏰ <b>Timing информация:</b>
-• Стратегия: <i>{strategy}</i>
-• Время ожидания: <i>{wait_time:.1f} мин</i>  
-• Причина входа: <i>{entry_reason}</i>
-• Исходная цена: <code>${original_price:.5f}</code>
-{improvement_text}
-
-🎚️ <b>Уровни:</b>
-🛑 SL: <code>${signal['stop_loss']:.5f}</code>
-🎯 TP1: <code>${signal['take_profit'][0]:.5f}</code>
-🎯 TP2: <code>${signal['take_profit'][1]:.5f}</code>
-🎯 TP3: <code>${signal['take_profit'][2]:.5f}</code>
-
-💡 <i>Timing система дождалась оптимального момента для входа!</i>
-"""
-        
-        # Отправляем с эмодзи в зависимости от направления
-        emoji = "🟢" if direction == "BUY" else "🔴"
-        
-        return await tg_bot.send_message(message.strip(), parse_mode='HTML')
-        
-    except Exception as e:
-        logger.error(f"Ошибка отправки timing сигнала: {str(e)}")
-        return False
+            current = candidate
 
-# Добавляем метод в класс телеграм бота (если он используется)
-def patch_telegram_bot():
-    """Добавляет метод send_timing_signal в телеграм бота"""
-    try:
-        if create_telegram_bot:
-            # Патчим класс телеграм бота
-            original_bot = create_telegram_bot()
-            if original_bot:
-                original_bot.__class__.send_timing_signal = send_timing_signal
-    except:
-        pass
+    if current:
+        chunks.append(current)
+    return chunks
+
+async def send_timing_signal(tg_bot, signal):
+    """Отправляет сигнал с timing информацией в Telegram.
+
+    Ошибки не перехватываются здесь - их централизованно обрабатывает
+    потребитель очереди (telegram_sender).
+    """
+    message = format_timing_block(signal)
+    return await tg_bot.send_message(message, parse_mode='HTML')
+
+# Метод подключается к классу прямо на этапе импорта модуля:
+# не зависит от того, удалось ли создать бота в runtime
+try:
+    from utils.telegram_bot import TelegramBot
+    TelegramBot.send_timing_signal = send_timing_signal
+except ImportError:
+    pass
 
 if __name__ == "__main__":
     try:
         print("🏁 Запуск системы с улучшенным timing...")
-        
-        # Патчим телеграм бота
-        patch_telegram_bot()
-        
+
+        # uvloop заметно ускоряет сокеты/таймеры/создание задач;
+        # на Windows его нет - остаемся на стандартном цикле
+        try:
+            import uvloop
+            uvloop.install()
+            print("⚡ uvloop активирован")
+        except ImportError:
+            pass
+
         asyncio.run(main_loop_v2())
     except KeyboardInterrupt:
         print("\n👋 Система остановлена пользователем")
@@ -12,9 +12,17 @@ import time
 import signal
 import sys
 import os
-import json
 from datetime import datetime
 
+# uvloop заметно снижает накладные расходы event loop на каждый await.
+# VT_PROFILE=1 оставляет штатный loop (профилировщики его понимают лучше).
+if not os.environ.get('VT_PROFILE'):
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass  # Необязательная зависимость - работаем на штатном asyncio
+
 # Настройка логирования
 from config.logging_config import setup_logging
 logger = setup_logging()
@@ -32,65 +40,96 @@ from virtual_trading import VirtualTraderV2
 virtual_trader = None
 shutdown_requested = False
 
-def setup_signal_handlers():
-    """Единственный быстрый обработчик сигналов для корректного завершения"""
-    def fast_signal_handler(signum, frame):
+# Событие завершения: будит паузы между циклами мгновенно,
+# вместо посекундного опроса флага shutdown_requested
+shutdown_event = asyncio.Event()
+
+# Кэш отформатированного времени с точностью до секунды:
+# strftime выполняется максимум раз в секунду, а не каждый цикл
+_ts_cache = [0, ""]
+
+def now_str() -> str:
+    """Текущее время 'YYYY-MM-DD HH:MM:SS' с кэшем на секунду"""
+    t = int(time.time())
+    if t != _ts_cache[0]:
+        _ts_cache[0] = t
+        _ts_cache[1] = f"{datetime.fromtimestamp(t):%Y-%m-%d %H:%M:%S}"
+    return _ts_cache[1]
+
+async def interruptible_sleep(seconds: float) -> None:
+    """Пауза, которую сигнал завершения прерывает без ожидания"""
+    try:
+        await asyncio.wait_for(shutdown_event.wait(), timeout=seconds)
+    except asyncio.TimeoutError:
+        pass
+
+def setup_signal_handlers(loop):
+    """Единственный быстрый обработчик сигналов для корректного завершения.
+
+    Регистрируется через loop.add_signal_handler: обработчик выполняется
+    внутри event loop, поэтому asyncio-состояние (shutdown_event) трогаем
+    напрямую, а страховочное завершение планируем через loop.call_later -
+    без отдельного потока-таймера.
+    """
+    def fast_signal_handler(signum):
         global shutdown_requested
-        
+
         signal_name = "SIGINT" if signum == signal.SIGINT else f"Signal {signum}"
         print(f"\n🛑 {signal_name} получен! Быстрое завершение...")
-        logger.warning(f"🛑 Получен сигнал завершения {signum}")
-        
+        logger.warning("🛑 Получен сигнал завершения %s", signum)
+
         shutdown_requested = True
-        
+        shutdown_event.set()  # Мы в контексте event loop - set безопасен
+
         # БЫСТРОЕ сохранение только критичных данных
         try:
             if virtual_trader:
                 print("💾 Экстренное сохранение...")
-                
+
                 # Используем новый метод quick_save
                 emergency_file = virtual_trader.quick_save()
                 if emergency_file:
                     print(f"✅ Данные сохранены: {emergency_file}")
-                
+
                 # Быстрый txt summary
                 stats = virtual_trader.calculate_statistics()
                 virtual_trader.create_quick_txt_summary(stats)
                 print(f"📄 Отчет создан: {virtual_trader.results_dir}/session_summary.txt")
-                
+
         except Exception as e:
             print(f"⚠️ Ошибка экстренного сохранения: {e}")
-            logger.error(f"Ошибка экстренного сохранения: {e}")
-        
+            logger.error("Ошибка экстренного сохранения: %s", e)
+
         print("👋 Принудительное завершение через 2 сек...")
-        
-        # Принудительное завершение через 2 секунды
-        def force_exit():
-            print("🏁 Принудительное завершение!")
-            os._exit(0)  # Агрессивное завершение
-        
-        import threading
-        timer = threading.Timer(2.0, force_exit)
-        timer.start()
-    
+
+        # Страховка: если graceful-завершение застрянет - жесткий выход
+        loop.call_later(2.0, os._exit, 0)
+
     # Регистрируем обработчики ТОЛЬКО здесь
-    signal.signal(signal.SIGINT, fast_signal_handler)
-    signal.signal(signal.SIGTERM, fast_signal_handler)
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, fast_signal_handler, sig)
+        except NotImplementedError:
+            # Windows / нестандартный loop: откат на signal.signal
+            signal.signal(sig, lambda signum, frame: fast_signal_handler(signum))
 
 async def run_virtual_trader():
     """Основная функция запуска виртуального трейдера"""
     global virtual_trader, shutdown_requested
     
-    print("🤖 ВИРТУАЛЬНЫЙ ТРЕЙДЕР V2 - МОДУЛЬНАЯ АРХИТЕКТУРА")
-    print("=" * 70)
-    print("🎯 Режим: Виртуальное тестирование сигналов с timing")
-    print("📋 Архитектура:")
-    print("   • models/ - VirtualPosition, ClosedTrade")
-    print("   • services/ - BalanceManager, PositionManager, Statistics, Reports")
-    print("   • core/ - VirtualTraderV2 (главный оркестратор)")
-    print("   • Интеграция с timing системой")
-    print("   • Автоматическое сохранение результатов")
-    print("=" * 70)
+    # Баннер одним write вместо десятка print - один syscall на блок
+    sys.stdout.write("\n".join([
+        "🤖 ВИРТУАЛЬНЫЙ ТРЕЙДЕР V2 - МОДУЛЬНАЯ АРХИТЕКТУРА",
+        "=" * 70,
+        "🎯 Режим: Виртуальное тестирование сигналов с timing",
+        "📋 Архитектура:",
+        "   • models/ - VirtualPosition, ClosedTrade",
+        "   • services/ - BalanceManager, PositionManager, Statistics, Reports",
+        "   • core/ - VirtualTraderV2 (главный оркестратор)",
+        "   • Интеграция с timing системой",
+        "   • Автоматическое сохранение результатов",
+        "=" * 70,
+    ]) + "\n")
     
     display_startup_info()
     
@@ -104,12 +143,14 @@ async def run_virtual_trader():
         max_exposure_percent=20.0     # Максимум 20% экспозиция
     )
     
-    print(f"💰 Стартовый баланс: ${virtual_trader.initial_balance:,.2f}")
-    print(f"📊 Размер позиции: {virtual_trader.balance_manager.position_size_percent}% (${virtual_trader.balance_manager.position_size_usd:,.0f})")
-    print(f"🛡️ Максимальная экспозиция: {virtual_trader.balance_manager.max_exposure_percent}%")
-    print(f"📁 Результаты: {virtual_trader.results_dir}/")
-    print("✅ Виртуальный трейдер готов к работе")
-    print("=" * 60)
+    sys.stdout.write("\n".join([
+        f"💰 Стартовый баланс: ${virtual_trader.initial_balance:,.2f}",
+        f"📊 Размер позиции: {virtual_trader.balance_manager.position_size_percent}% (${virtual_trader.balance_manager.position_size_usd:,.0f})",
+        f"🛡️ Максимальная экспозиция: {virtual_trader.balance_manager.max_exposure_percent}%",
+        f"📁 Результаты: {virtual_trader.results_dir}/",
+        "✅ Виртуальный трейдер готов к работе",
+        "=" * 60,
+    ]) + "\n")
     
     # Подключаемся к API и запускаем торговый движок
     print("\n🔗 Подключение к API и инициализация торгового движка...")
@@ -122,11 +163,13 @@ async def run_virtual_trader():
         print("✅ Торговый движок с timing инициализирован")
         logger.info("✅ Торговый движок с timing инициализирован")
         
-        print(f"\n🔄 Начинаем виртуальную торговлю...")
-        print(f"📊 Отслеживаемые символы: {len(SYMBOLS)}")
-        print(f"⏱️ Интервал проверки: {INTERVAL_SEC} сек")
-        print(f"💡 Для остановки нажмите Ctrl+C (быстрое завершение)")
-        print("=" * 70)
+        sys.stdout.write("\n".join([
+            "\n🔄 Начинаем виртуальную торговлю...",
+            f"📊 Отслеживаемые символы: {len(SYMBOLS)}",
+            f"⏱️ Интервал проверки: {INTERVAL_SEC} сек",
+            "💡 Для остановки нажмите Ctrl+C (быстрое завершение)",
+            "=" * 70,
+        ]) + "\n")
         
         cycle_count = 0
         total_signals_generated = 0
@@ -136,47 +179,63 @@ async def run_virtual_trader():
         while not shutdown_requested:
             try:
                 cycle_count += 1
-                start_time = time.time()
+                # Монотонный целочисленный таймер: не зависит от скачков
+                # системных часов и не теряет точность на коротких циклах
+                cycle_start_ns = time.perf_counter_ns()
                 
                 # Быстрая проверка shutdown
                 if shutdown_requested:
                     print("\n🛑 Получен сигнал завершения в цикле")
                     break
                 
-                logger.info(f"\n{'='*70}")
-                logger.info(f"🔍 Цикл #{cycle_count}: Виртуальная торговля с timing (модульная архитектура)")
-                logger.info(f"⏰ Время: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-                
-                # ФАЗА 1: Генерация новых сигналов (добавляем в timing систему)
-                new_signals = await engine.analyze_and_generate_signals(SYMBOLS)
+                logger.info("\n%s", '='*70)
+                logger.info("🔍 Цикл #%d: Виртуальная торговля с timing (модульная архитектура)", cycle_count)
+                logger.info("⏰ Время: %s", now_str())
                 
+                # ФАЗЫ 1-3 ждут в основном сеть и независимы по данным:
+                # timing-входы проверяются по сигналам прошлых циклов,
+                # а выходы - по уже открытым позициям. Запускаем их
+                # параллельно одним gather вместо последовательных await.
+                new_signals, ready_entries, _ = await asyncio.gather(
+                    engine.analyze_and_generate_signals(SYMBOLS),
+                    engine.check_ready_entries(),
+                    virtual_trader.check_position_exits(api)
+                    if virtual_trader.open_positions else asyncio.sleep(0),
+                    return_exceptions=True
+                )
+
+                # Ошибку одной фазы логируем отдельно, остальные фазы не теряем
+                if isinstance(new_signals, Exception):
+                    logger.error("❌ Ошибка фазы анализа сигналов: %s", new_signals)
+                    new_signals = []
+                if isinstance(ready_entries, Exception):
+                    logger.error("❌ Ошибка фазы timing входов: %s", ready_entries)
+                    ready_entries = []
+                if isinstance(_, Exception):
+                    logger.error("❌ Ошибка фазы проверки выходов: %s", _)
+
                 if shutdown_requested:
                     break
-                
+
                 if new_signals:
                     total_signals_generated += len(new_signals)
                     virtual_trader.total_signals += len(new_signals)
                     
-                    logger.info(f"📊 Новых сигналов добавлено в timing очередь: {len(new_signals)}")
+                    logger.info("📊 Новых сигналов добавлено в timing очередь: %d", len(new_signals))
                     print(f"📊 Цикл {cycle_count}: Найдено {len(new_signals)} новых сигналов для timing")
                     
                     for signal_info in new_signals:
                         signal = signal_info['signal']
                         timing_strategy = signal_info['timing_strategy']
                         
-                        logger.info(f"⏳ {signal['symbol']} {signal['direction']} "
-                                   f"(стратегия: {timing_strategy}, "
-                                   f"уверенность: {signal.get('confidence', 0):.1%})")
-                
-                # ФАЗА 2: Проверка готовых к входу сигналов
-                ready_entries = await engine.check_ready_entries()
-                
-                if shutdown_requested:
-                    break
+                        logger.info("⏳ %s %s (стратегия: %s, уверенность: %.1f%%)",
+                                   signal['symbol'], signal['direction'],
+                                   timing_strategy, signal.get('confidence', 0) * 100)
                 
+                # Готовые к входу сигналы (получены в общем gather выше)
                 if ready_entries:
                     total_entries_executed += len(ready_entries)
-                    logger.info(f"🎯 Готовых к входу сигналов: {len(ready_entries)}")
+                    logger.info("🎯 Готовых к входу сигналов: %d", len(ready_entries))
                     print(f"🎯 Готовых к входу: {len(ready_entries)}")
                     
                     for entry_signal in ready_entries:
@@ -188,14 +247,9 @@ async def run_virtual_trader():
                             print(f"📈 {entry_signal['symbol']} {entry_signal['direction'].upper()} "
                                   f"добавлен в виртуальный портфель (модульная система)")
                         except Exception as vt_error:
-                            logger.error(f"❌ Ошибка виртуальной торговли {entry_signal['symbol']}: {vt_error}")
+                            logger.error("❌ Ошибка виртуальной торговли %s: %s", entry_signal['symbol'], vt_error)
                             print(f"❌ Ошибка: {entry_signal['symbol']} - {vt_error}")
                 
-                # ФАЗА 3: Проверка закрытия виртуальных позиций
-                if virtual_trader.open_positions and not shutdown_requested:
-                    logger.debug(f"🔍 Проверяем закрытие {len(virtual_trader.open_positions)} виртуальных позиций...")
-                    await virtual_trader.check_position_exits(api)
-                
                 # ФАЗА 4: Логирование статуса виртуального трейдера
                 if not shutdown_requested:
                     await virtual_trader.log_status(api, engine)
@@ -205,97 +259,99 @@ async def run_virtual_trader():
                 pending_count = len(timing_status.get('pending_entries', []))
                 
                 # Краткая статистика цикла
-                cycle_time = time.time() - start_time
-                
-                logger.info(f"\n📊 ЦИКЛ #{cycle_count} ЗАВЕРШЕН:")
-                logger.info(f"   🔍 Новых сигналов в очереди: {len(new_signals)}")
-                logger.info(f"   🎯 Готовых входов: {len(ready_entries)}")
-                logger.info(f"   ⏳ Ожидающих входов: {pending_count}")
-                logger.info(f"   💼 Виртуальных позиций: {len(virtual_trader.open_positions)}")
-                logger.info(f"   📈 Виртуальных сделок: {len(virtual_trader.closed_trades)}")
-                logger.info(f"   ⏱️ Время цикла: {cycle_time:.1f} сек")
+                cycle_time = (time.perf_counter_ns() - cycle_start_ns) / 1e9
+
+                # Размеры коллекций читаем по одному разу за цикл:
+                # без повторных LOAD_ATTR + len() в сводке и отчете
+                n_open = len(virtual_trader.open_positions)
+                n_closed = len(virtual_trader.closed_trades)
+
+                # Одна запись в лог вместо семи: один проход по цепочке
+                # фильтров/хендлеров и одно взятие блокировки хендлера
+                logger.info(
+                    "\n📊 ЦИКЛ #%d ЗАВЕРШЕН: 🔍 новых=%d | 🎯 готовых=%d | "
+                    "⏳ ожидающих=%d | 💼 позиций=%d | 📈 сделок=%d | ⏱️ %.1f сек",
+                    cycle_count, len(new_signals), len(ready_entries), pending_count,
+                    n_open, n_closed, cycle_time)
                 
-                # Детальный отчет каждые 20 циклов
+                # Детальный отчет каждые 20 циклов: собираем строки и пишем
+                # одним sys.stdout.write вместо ~20 отдельных print/syscall
                 if cycle_count % 20 == 0 and not shutdown_requested:
-                    print(f"\n📋 ДЕТАЛЬНЫЙ ОТЧЕТ (цикл {cycle_count}):")
-                    print("=" * 50)
-                    
+                    lines = [f"\n📋 ДЕТАЛЬНЫЙ ОТЧЕТ (цикл {cycle_count}):", "=" * 50]
+
                     # Статус timing
                     if pending_count > 0:
-                        print(f"⏳ ОЖИДАЮЩИЕ ВХОДЫ ({pending_count}):")
+                        lines.append(f"⏳ ОЖИДАЮЩИЕ ВХОДЫ ({pending_count}):")
                         for entry in timing_status.get('pending_entries', []):
-                            print(f"   {entry['symbol']} {entry['direction'].upper()} "
-                                  f"| {entry['timing_type']} "
-                                  f"| Ждем: {entry['time_waiting']} "
-                                  f"| Подтв.: {entry['confirmations']}")
+                            lines.append(f"   {entry['symbol']} {entry['direction'].upper()} "
+                                         f"| {entry['timing_type']} "
+                                         f"| Ждем: {entry['time_waiting']} "
+                                         f"| Подтв.: {entry['confirmations']}")
                     else:
-                        print("⏳ Ожидающих timing входов нет")
-                    
+                        lines.append("⏳ Ожидающих timing входов нет")
+
                     # Статус виртуального трейдера (новая модульная система)
-                    if len(virtual_trader.closed_trades) > 0:
+                    if n_closed > 0:
                         stats = virtual_trader.calculate_statistics()
-                        
-                        print(f"\n💼 ВИРТУАЛЬНЫЙ ПОРТФЕЛЬ (МОДУЛЬНАЯ СИСТЕМА):")
-                        print(f"   💰 Баланс: ${stats['current_balance']:,.2f} ({stats['balance_percent']:+.2f}%)")
-                        print(f"   📊 Сделок: {stats['total_trades']} (винрейт: {stats['win_rate']:.1f}%)")
-                        print(f"   📍 Позиций: {len(virtual_trader.open_positions)}")
-                        print(f"   ⏰ Timing входов: {stats['timing_analysis']['entries_from_timing']}")
-                        print(f"   ⚡ Немедленных входов: {stats['timing_analysis']['immediate_entries']}")
-                        
+
+                        lines.append(f"\n💼 ВИРТУАЛЬНЫЙ ПОРТФЕЛЬ (МОДУЛЬНАЯ СИСТЕМА):")
+                        lines.append(f"   💰 Баланс: ${stats['current_balance']:,.2f} ({stats['balance_percent']:+.2f}%)")
+                        lines.append(f"   📊 Сделок: {stats['total_trades']} (винрейт: {stats['win_rate']:.1f}%)")
+                        lines.append(f"   📍 Позиций: {n_open}")
+                        lines.append(f"   ⏰ Timing входов: {stats['timing_analysis']['entries_from_timing']}")
+                        lines.append(f"   ⚡ Немедленных входов: {stats['timing_analysis']['immediate_entries']}")
+
                         # Показываем сводку по сервисам
                         balance_summary = virtual_trader.get_balance_summary()
                         positions_summary = virtual_trader.get_positions_summary()
                         trades_summary = virtual_trader.get_trades_summary()
-                        
-                        print(f"\n🔧 МОДУЛЬНАЯ СТАТИСТИКА:")
-                        print(f"   BalanceManager: Экспозиция {balance_summary['exposure_percent']:.1f}%")
-                        print(f"   PositionManager: {positions_summary['total_positions']} позиций")
-                        print(f"   StatisticsCalculator: Обработано {len(virtual_trader.statistics_calculator.session_history)} записей")
-                        print(f"   ReportGenerator: Сохранено в {virtual_trader.report_generator.results_dir}/")
-                        
+
+                        lines.append(f"\n🔧 МОДУЛЬНАЯ СТАТИСТИКА:")
+                        lines.append(f"   BalanceManager: Экспозиция {balance_summary['exposure_percent']:.1f}%")
+                        lines.append(f"   PositionManager: {positions_summary['total_positions']} позиций")
+                        lines.append(f"   StatisticsCalculator: Обработано {len(virtual_trader.statistics_calculator.session_history)} записей")
+                        lines.append(f"   ReportGenerator: Сохранено в {virtual_trader.report_generator.results_dir}/")
+
                         # Показываем последние 3 сделки
-                        if virtual_trader.closed_trades:
-                            print(f"\n📝 ПОСЛЕДНИЕ 3 СДЕЛКИ:")
-                            for trade in virtual_trader.closed_trades[-3:]:
+                        if n_closed:
+                            lines.append(f"\n📝 ПОСЛЕДНИЕ 3 СДЕЛКИ:")
+                            for trade in virtual_trader.get_recent_trades(3):
                                 profit_emoji = "💚" if trade.pnl_usd > 0 else "❤️"
                                 timing_type = trade.timing_info.get('timing_type', 'immediate') if trade.timing_info else 'immediate'
-                                print(f"   {profit_emoji} {trade.symbol} {trade.direction.upper()} "
-                                      f"{trade.pnl_percent:+.1f}% (${trade.pnl_usd:+.2f}) "
-                                      f"{trade.exit_reason} [{timing_type}]")
+                                lines.append(f"   {profit_emoji} {trade.symbol} {trade.direction.upper()} "
+                                             f"{trade.pnl_percent:+.1f}% (${trade.pnl_usd:+.2f}) "
+                                             f"{trade.exit_reason} [{timing_type}]")
                     else:
-                        print(f"\n💼 ВИРТУАЛЬНЫЙ ПОРТФЕЛЬ: Пока нет закрытых сделок")
-                        print(f"🔧 МОДУЛЬНАЯ СИСТЕМА: Готова к работе")
-                    
-                    print("=" * 50)
+                        lines.append(f"\n💼 ВИРТУАЛЬНЫЙ ПОРТФЕЛЬ: Пока нет закрытых сделок")
+                        lines.append(f"🔧 МОДУЛЬНАЯ СИСТЕМА: Готова к работе")
+
+                    lines.append("=" * 50)
+                    sys.stdout.write("\n".join(lines) + "\n")
                 
-                # Автосохранение каждые 60 циклов
+                # Автосохранение каждые 60 циклов: сериализация и запись
+                # на диск уходят в worker-поток, event loop не блокируется
+                # (файлы пишутся атомарно через tmp + os.replace)
                 if cycle_count % 60 == 0 and not shutdown_requested:
                     logger.info("💾 Автосохранение...")
                     try:
-                        virtual_trader.save_results()
+                        await asyncio.to_thread(virtual_trader.save_results)
                         print(f"💾 Автосохранение выполнено (цикл {cycle_count})")
                     except Exception as save_error:
-                        logger.error(f"❌ Ошибка автосохранения: {save_error}")
+                        logger.error("❌ Ошибка автосохранения: %s", save_error)
                 
-                logger.info(f"{'='*70}")
+                logger.info("%s", '='*70)
                 
-                # Пауза между циклами с проверкой shutdown
-                for i in range(INTERVAL_SEC):
-                    if shutdown_requested:
-                        break
-                    await asyncio.sleep(1)
+                # Пауза между циклами: событие завершения прерывает сон сразу
+                await interruptible_sleep(INTERVAL_SEC)
                 
             except Exception as e:
                 if shutdown_requested:
                     break
                 print(f"❌ Ошибка в цикле виртуального трейдера: {str(e)}")
-                logger.error(f"Ошибка в цикле виртуального трейдера: {str(e)}")
+                logger.error("Ошибка в цикле виртуального трейдера: %s", e)
                 
-                # Пауза при ошибке с проверкой shutdown
-                for i in range(30):
-                    if shutdown_requested:
-                        break
-                    await asyncio.sleep(1)
+                # Пауза при ошибке: тоже прерываемая
+                await interruptible_sleep(30)
     
     # Финальное сохранение если не было прерывания
     if not shutdown_requested and virtual_trader:
@@ -315,7 +371,8 @@ async def main():
     """Главная функция"""
     try:
         # Настраиваем обработчики сигналов в самом начале
-        setup_signal_handlers()
+        # (регистрация на уже работающем event loop)
+        setup_signal_handlers(asyncio.get_running_loop())
         
         # Запускаем виртуального трейдера
         await run_virtual_trader()
@@ -337,10 +394,10 @@ async def main():
         print("🔄 Программа завершена.")
 
 if __name__ == "__main__":
-    print("🚀 ЗАПУСК ВИРТУАЛЬНОГО ТРЕЙДЕРА V2 (БЫСТРОЕ ЗАВЕРШЕНИЕ)")
-    print("🎯 models/ + services/ + core/ = новая система")
-    print("💡 Для остановки нажмите Ctrl+C (быстрое завершение через 2 сек)")
-    print()
+    print("🚀 ЗАПУСК ВИРТУАЛЬНОГО ТРЕЙДЕРА V2 (БЫСТРОЕ ЗАВЕРШЕНИЕ)\n"
+          "🎯 models/ + services/ + core/ = новая система\n"
+          "💡 Для остановки нажмите Ctrl+C (быстрое завершение через 2 сек)\n",
+          flush=True)
     
     try:
         asyncio.run(main())
@@ -6,15 +6,27 @@ COMPREHENSIVE тест для BalanceManager V3.0
 
 import sys
 import os
+import numpy as np
 from datetime import datetime
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import Optional
 
 # Добавляем пути для импортов
 sys.path.append('.')
 sys.path.append('virtual_trading')
 
+def _flush(lines) -> None:
+    """Сбрасывает накопленные строки одним sys.stdout.write.
+
+    Один syscall и одно взятие блокировки stdout на блок вывода
+    вместо отдельного print на каждую строку.
+    """
+    if lines:
+        sys.stdout.write("\n".join(lines) + "\n")
+        lines.clear()
+
 # Моки для тестирования
-@dataclass
+@dataclass(slots=True)
 class MockPosition:
     """Мок позиции для тестирования"""
     symbol: str
@@ -24,40 +36,46 @@ class MockPosition:
     tp1_filled: bool = False
     tp2_filled: bool = False
     tp3_filled: bool = False
-    
+    entry_time: Optional[datetime] = None
+    # Кэш остатка количества: считается лениво, сбрасывается при смене флагов
+    _remaining_q: Optional[float] = field(default=None, init=False, repr=False)
+
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        # Запись tpN_filled/quantity инвалидирует кэшированный остаток
+        if name.startswith('tp') or name == 'quantity':
+            object.__setattr__(self, '_remaining_q', None)
+
     def get_remaining_percent(self) -> int:
-        percent = 100
-        if self.tp1_filled:
-            percent -= 50
-        if self.tp2_filled:
-            percent -= 25
-        if self.tp3_filled:
-            percent -= 25
-        return max(0, percent)
-    
+        # Булевы флаги работают как 0/1 - арифметика вместо трех ветвлений
+        return max(0, 100 - 50 * self.tp1_filled - 25 * self.tp2_filled - 25 * self.tp3_filled)
+
     def get_remaining_quantity(self) -> float:
-        remaining = self.quantity
-        if self.tp1_filled:
-            remaining -= self.quantity * 0.5
-        if self.tp2_filled:
-            remaining -= self.quantity * 0.25
-        if self.tp3_filled:
-            remaining -= self.quantity * 0.25
-        return max(0, remaining)
+        remaining = self._remaining_q
+        if remaining is None:
+            remaining = self.quantity * (
+                1.0 - 0.5 * self.tp1_filled - 0.25 * self.tp2_filled - 0.25 * self.tp3_filled)
+            self._remaining_q = remaining
+        return max(0.0, remaining)
 
 def test_balance_manager():
     """Основной тест BalanceManager"""
-    print("🧪 COMPREHENSIVE ТЕСТ BALANCE MANAGER V3.0")
-    print("=" * 60)
-    
+    # Вывод копится в буфере и уходит в stdout пачками через _flush
+    out = []
+    # Одно datetime.now() на весь тест: тесты не зависят от различия
+    # меток времени, а каждый вызов - это syscall clock_gettime
+    _now = datetime.now()
+    out.append("🧪 COMPREHENSIVE ТЕСТ BALANCE MANAGER V3.0")
+    out.append("=" * 60)
+
     try:
         # Импорт после настройки путей
-        from virtual_trading.services.balance_manager import BalanceManager
+        from virtual_trading.services.balance_manager import BalanceManager, BlockReason
         
-        print("✅ Импорт BalanceManager успешен")
+        out.append("✅ Импорт BalanceManager успешен")
         
         # Тест 1: Инициализация
-        print("\n🔍 ТЕСТ 1: Инициализация")
+        out.append("\n🔍 ТЕСТ 1: Инициализация")
         balance_manager = BalanceManager(
             initial_balance=10000.0,
             position_size_percent=2.0,
@@ -71,30 +89,31 @@ def test_balance_manager():
         assert balance_manager.total_invested == 0.0
         assert balance_manager.total_realized_pnl == 0.0
         
-        print("✅ Инициализация корректна")
+        out.append("✅ Инициализация корректна")
         
         # Тест 2: Резервирование средств
-        print("\n🔍 ТЕСТ 2: Резервирование средств")
+        out.append("\n🔍 ТЕСТ 2: Резервирование средств")
         positions = {}
         
         can_open, reason = balance_manager.can_open_new_position(positions)
         assert can_open == True
-        assert reason == "ok"
+        assert reason is BlockReason.OK
         
         success = balance_manager.reserve_funds(200.0)
         assert success == True
         assert balance_manager.available_balance == 9800.0
         assert balance_manager.total_invested == 200.0
         
-        print("✅ Резервирование работает корректно")
+        out.append("✅ Резервирование работает корректно")
         
         # Тест 3: Создание позиции
-        print("\n🔍 ТЕСТ 3: Позиция и расчеты")
+        out.append("\n🔍 ТЕСТ 3: Позиция и расчеты")
         position = MockPosition(
             symbol="BTCUSDT",
             direction="buy",
             entry_price=50000.0,
-            quantity=200.0 / 50000.0  # 0.004 BTC
+            quantity=200.0 / 50000.0,  # 0.004 BTC
+            entry_time=_now
         )
         positions["BTCUSDT"] = position
         
@@ -105,10 +124,10 @@ def test_balance_manager():
         current_balance = balance_manager.get_current_balance(positions)
         assert current_balance == 10000.0  # 9800 + 200
         
-        print("✅ Расчеты позиций корректны")
+        out.append("✅ Расчеты позиций корректны")
         
         # Тест 4: Нереализованный P&L
-        print("\n🔍 ТЕСТ 4: Нереализованный P&L")
+        out.append("\n🔍 ТЕСТ 4: Нереализованный P&L")
         current_prices = {"BTCUSDT": 52000.0}  # Цена выросла на $2000
         
         unrealized_pnl = balance_manager.get_unrealized_pnl(positions, current_prices)
@@ -118,10 +137,10 @@ def test_balance_manager():
         current_balance_with_pnl = balance_manager.get_current_balance(positions, current_prices)
         assert abs(current_balance_with_pnl - (10000.0 + expected_pnl)) < 0.01
         
-        print(f"✅ Нереализованный P&L: ${unrealized_pnl:+.2f}")
+        out.append(f"✅ Нереализованный P&L: ${unrealized_pnl:+.2f}")
         
         # Тест 5: Частичное закрытие (TP1 - 50%)
-        print("\n🔍 ТЕСТ 5: Частичное закрытие TP1")
+        out.append("\n🔍 ТЕСТ 5: Частичное закрытие TP1")
         tp1_price = 52000.0
         tp1_quantity = position.quantity * 0.5
         tp1_pnl = tp1_quantity * (tp1_price - position.entry_price)  # 0.002 * 2000 = $4
@@ -130,14 +149,16 @@ def test_balance_manager():
         balance_manager.release_funds(100.0, tp1_pnl)  # 50% от $200 + P&L
         position.tp1_filled = True
         
-        assert abs(balance_manager.available_balance - (9800.0 + 100.0 + tp1_pnl)) < 0.01
+        # Аккумулятор P&L хранится целыми микро-долларами - суммы точные,
+        # допуски не нужны: проверяем точным равенством
+        assert balance_manager.available_balance == 9800.0 + 100.0 + tp1_pnl
         assert balance_manager.total_invested == 100.0  # Осталось 50%
-        assert abs(balance_manager.total_realized_pnl - tp1_pnl) < 0.01
+        assert balance_manager.total_realized_pnl == tp1_pnl
         
-        print(f"✅ TP1 закрыт с P&L: ${tp1_pnl:+.2f}")
+        out.append(f"✅ TP1 закрыт с P&L: ${tp1_pnl:+.2f}")
         
         # Тест 6: Проверка баланса после частичного закрытия
-        print("\n🔍 ТЕСТ 6: Баланс после частичного закрытия")
+        out.append("\n🔍 ТЕСТ 6: Баланс после частичного закрытия")
         invested_capital = balance_manager.get_invested_capital(positions)
         assert invested_capital == 100.0  # 50% от $200
         
@@ -149,10 +170,10 @@ def test_balance_manager():
         expected_balance = balance_manager.available_balance + invested_capital + unrealized_pnl
         assert abs(current_balance - expected_balance) < 0.01
         
-        print(f"✅ Баланс корректен: ${current_balance:.2f}")
+        out.append(f"✅ Баланс корректен: ${current_balance:.2f}")
         
         # Тест 7: Полное закрытие позиции
-        print("\n🔍 ТЕСТ 7: Полное закрытие позиции")
+        out.append("\n🔍 ТЕСТ 7: Полное закрытие позиции")
         # Закрываем остальные 50%
         remaining_quantity = position.get_remaining_quantity()
         remaining_pnl = remaining_quantity * (52000.0 - 50000.0)
@@ -167,122 +188,149 @@ def test_balance_manager():
         # Проверяем финальное состояние
         final_balance = balance_manager.get_current_balance(positions)
         expected_final = balance_manager.initial_balance + balance_manager.total_realized_pnl
-        assert abs(final_balance - expected_final) < 0.01
+        assert final_balance == expected_final
         assert balance_manager.total_invested == 0.0
         
-        print(f"✅ Позиция полностью закрыта, баланс: ${final_balance:.2f}")
+        out.append(f"✅ Позиция полностью закрыта, баланс: ${final_balance:.2f}")
         
         # Тест 8: Лимиты экспозиции
-        print("\n🔍 ТЕСТ 8: Тестирование лимитов")
-        
-        # Имитируем много позиций для проверки лимита экспозиции
-        test_positions = {}
-        for i in range(10):  # 10 позиций по $200 = $2000 (лимит экспозиции)
-            balance_manager.reserve_funds(200.0)
-            test_positions[f"TEST{i}"] = MockPosition(f"TEST{i}", "buy", 100.0, 2.0)
-        
+        out.append("\n🔍 ТЕСТ 8: Тестирование лимитов")
+        
+        # Имитируем много позиций для проверки лимита экспозиции.
+        # Параметры позиций держим SoA-массивами (Structure-of-Arrays):
+        # ожидаемая экспозиция считается одним векторным выражением,
+        # без обхода dict и атрибутов объектов
+        n_positions = 10  # 10 позиций по $200 = $2000 (лимит экспозиции)
+        entry_prices = np.full(n_positions, 100.0)
+        quantities = np.full(n_positions, 2.0)
+        tp1_flags = np.zeros(n_positions, dtype=bool)
+        tp2_flags = np.zeros(n_positions, dtype=bool)
+        tp3_flags = np.zeros(n_positions, dtype=bool)
+
+        # Одно пакетное резервирование вместо 10 вызовов в цикле
+        reserved = balance_manager.reserve_funds_bulk(200.0, n_positions)
+        assert reserved == n_positions
+        test_positions = {
+            f"TEST{i}": MockPosition(f"TEST{i}", "buy", float(entry_prices[i]), float(quantities[i]),
+                                     entry_time=_now)
+            for i in range(n_positions)
+        }
+
+        # Остаток позиций без ветвлений: булевы массивы работают как 0/1
+        remaining_frac = 1.0 - 0.5 * tp1_flags - 0.25 * tp2_flags - 0.25 * tp3_flags
+        expected_invested = float((200.0 * remaining_frac).sum())
+        assert abs(balance_manager.get_invested_capital(test_positions) - expected_invested) < 0.01
+
         # Проверяем лимит экспозиции
         can_open, reason = balance_manager.can_open_new_position(test_positions)
         assert can_open == False
-        assert reason == "exposure_limit"
-        
-        print("✅ Лимит экспозиции работает корректно")
-        
-        # Тест 9: Валидация состояния
-        print("\n🔍 ТЕСТ 9: Валидация состояния")
-        validation = balance_manager.validate_state()
-        
-        print(f"   Доступный баланс: ${balance_manager.available_balance:.2f}")
-        print(f"   Инвестировано: ${balance_manager.total_invested:.2f}")
-        print(f"   Реализованный P&L: ${balance_manager.total_realized_pnl:.2f}")
-        print(f"   Валидация: {'✅ OK' if validation['is_valid'] else '❌ ERROR'}")
-        
-        if not validation['is_valid']:
-            print(f"   Проблемы: {validation['issues']}")
-        
-        # Тест 10: Краткая сводка
-        print("\n🔍 ТЕСТ 10: Сводка баланса")
-        summary = balance_manager.get_balance_summary(test_positions)
+        assert reason is BlockReason.EXPOSURE
+
+        out.append("✅ Лимит экспозиции работает корректно")
         
-        print(f"   Текущий баланс: ${summary['current_balance']:,.2f}")
-        print(f"   Изменение баланса: {summary['balance_percent']:+.2f}%")
-        print(f"   Экспозиция: {summary['exposure_percent']:.1f}%")
+        # Тест 9 + 10: Сводка и валидация одним снимком - слагаемые
+        # баланса считаются один раз вместо двух отдельных проходов
+        out.append("\n🔍 ТЕСТ 9: Валидация состояния")
+        snap = balance_manager.snapshot(test_positions)
+
+        out.append(f"   Доступный баланс: ${snap.available_balance:.2f}")
+        out.append(f"   Инвестировано: ${balance_manager.total_invested:.2f}")
+        out.append(f"   Реализованный P&L: ${snap.total_realized_pnl:.2f}")
+        out.append(f"   Валидация: {'✅ OK' if snap.is_valid else '❌ ERROR'}")
+
+        if not snap.is_valid:
+            out.append(f"   Проблемы: {snap.issues}")
+
+        # Тест 10: Краткая сводка (из того же снимка)
+        out.append("\n🔍 ТЕСТ 10: Сводка баланса")
+        out.append(f"   Текущий баланс: ${snap.current_balance:,.2f}")
+        out.append(f"   Изменение баланса: {snap.balance_percent:+.2f}%")
+        out.append(f"   Экспозиция: {snap.exposure_percent:.1f}%")
         
         # Тест 11: Риск-лимиты
-        print("\n🔍 ТЕСТ 11: Проверка рисков")
+        out.append("\n🔍 ТЕСТ 11: Проверка рисков")
         risk_status = balance_manager.check_risk_limits(test_positions)
         
-        print(f"   Уровень риска: {risk_status['risk_level']}")
-        print(f"   Предупреждений: {len(risk_status['warnings'])}")
+        out.append(f"   Уровень риска: {risk_status['risk_level']}")
+        out.append(f"   Предупреждений: {len(risk_status['warnings'])}")
         
         for warning in risk_status['warnings']:
-            print(f"     ⚠️ {warning}")
+            out.append(f"     ⚠️ {warning}")
         
-        print("\n" + "=" * 60)
-        print("🎉 ВСЕ ТЕСТЫ ПРОЙДЕНЫ УСПЕШНО!")
-        print("✅ BalanceManager V3.0 готов к production!")
+        out.append("\n" + "=" * 60)
+        out.append("🎉 ВСЕ ТЕСТЫ ПРОЙДЕНЫ УСПЕШНО!")
+        out.append("✅ BalanceManager V3.0 готов к production!")
         
         # Финальная статистика
-        print(f"\n📊 ФИНАЛЬНАЯ СТАТИСТИКА:")
-        print(f"   Начальный баланс: ${balance_manager.initial_balance:,.2f}")
-        print(f"   Текущий баланс: ${summary['current_balance']:,.2f}")
-        print(f"   Реализованный P&L: ${balance_manager.total_realized_pnl:+.2f}")
-        print(f"   Экспозиция: {summary['exposure_percent']:.1f}% из {balance_manager.max_exposure_percent}%")
-        print(f"   Системный статус: {'🟢 ЗДОРОВ' if validation['is_valid'] else '🔴 ПРОБЛЕМЫ'}")
+        out.append(f"\n📊 ФИНАЛЬНАЯ СТАТИСТИКА:")
+        out.append(f"   Начальный баланс: ${snap.initial_balance:,.2f}")
+        out.append(f"   Текущий баланс: ${snap.current_balance:,.2f}")
+        out.append(f"   Реализованный P&L: ${snap.total_realized_pnl:+.2f}")
+        out.append(f"   Экспозиция: {snap.exposure_percent:.1f}% из {balance_manager.max_exposure_percent}%")
+        out.append(f"   Системный статус: {'🟢 ЗДОРОВ' if snap.is_valid else '🔴 ПРОБЛЕМЫ'}")
         
         return True
-        
+
     except ImportError as e:
-        print(f"❌ ОШИБКА ИМПОРТА: {e}")
-        print("   Убедитесь что virtual_trading модули доступны")
+        out.append(f"❌ ОШИБКА ИМПОРТА: {e}")
+        out.append("   Убедитесь что virtual_trading модули доступны")
         return False
-        
+
     except AssertionError as e:
-        print(f"❌ ТЕСТ ПРОВАЛЕН: Assertion error")
-        print(f"   Детали: {e}")
+        out.append(f"❌ ТЕСТ ПРОВАЛЕН: Assertion error")
+        out.append(f"   Детали: {e}")
         return False
-        
+
     except Exception as e:
-        print(f"❌ КРИТИЧЕСКАЯ ОШИБКА: {e}")
+        out.append(f"❌ КРИТИЧЕСКАЯ ОШИБКА: {e}")
         import traceback
+        _flush(out)
         traceback.print_exc()
         return False
 
+    finally:
+        # Буфер доезжает до stdout и при успехе, и при любом исключении
+        _flush(out)
+
 def test_edge_cases():
     """Тест крайних случаев"""
-    print("\n🧪 ТЕСТ КРАЙНИХ СЛУЧАЕВ")
-    print("=" * 40)
-    
+    out = []
+    out.append("\n🧪 ТЕСТ КРАЙНИХ СЛУЧАЕВ")
+    out.append("=" * 40)
+
     try:
         from virtual_trading.services.balance_manager import BalanceManager
         
         # Тест с маленьким балансом
-        print("🔍 Маленький баланс:")
+        out.append("🔍 Маленький баланс:")
         small_bm = BalanceManager(100.0, 10.0, 50.0)
         positions = {}
         can_open, reason = small_bm.can_open_new_position(positions)
-        print(f"   Можно открыть позицию: {'✅' if can_open else '❌'} ({reason})")
+        out.append(f"   Можно открыть позицию: {'✅' if can_open else '❌'} ({reason})")
         
         # Тест с нулевыми/отрицательными значениями
-        print("\n🔍 Валидация:")
+        out.append("\n🔍 Валидация:")
         validation = small_bm.validate_state()
-        print(f"   Система валидна: {'✅' if validation['is_valid'] else '❌'}")
+        out.append(f"   Система валидна: {'✅' if validation['is_valid'] else '❌'}")
         
         # Тест со множественными операциями
-        print("\n🔍 Множественные операции:")
+        out.append("\n🔍 Множественные операции:")
         for i in range(5):
             if small_bm.can_open_new_position({})[0]:
                 small_bm.reserve_funds(10.0)
                 small_bm.release_funds(10.0, 1.0)  # +$1 каждый раз
         
         final_validation = small_bm.validate_state()
-        print(f"   После 5 операций: {'✅' if final_validation['is_valid'] else '❌'}")
-        print(f"   P&L: ${small_bm.total_realized_pnl:+.2f}")
-        
-        print("✅ Крайние случаи обработаны корректно")
+        out.append(f"   После 5 операций: {'✅' if final_validation['is_valid'] else '❌'}")
+        out.append(f"   P&L: ${small_bm.total_realized_pnl:+.2f}")
         
+        out.append("✅ Крайние случаи обработаны корректно")
+
     except Exception as e:
-        print(f"❌ Ошибка в крайних случаях: {e}")
+        out.append(f"❌ Ошибка в крайних случаях: {e}")
+
+    finally:
+        _flush(out)
 
 if __name__ == "__main__":
     print("🚀 ЗАПУСК COMPREHENSIVE ТЕСТА BALANCE MANAGER")
@@ -4,122 +4,134 @@
 Проверяем математику для SELL позиции LTCUSDT
 """
 
+import logging
+
+import numpy as np
+
+# Ленивый %-логгер вместо print: при уровне выше INFO строки вообще
+# не форматируются (под pytest -q вся работа по выводу пропадает)
+log = logging.getLogger(__name__)
+
+# numba - опциональное ускорение (как в position_manager): ядро компилируется
+# в машинный код для прогонов по сеткам параметров, без numba работает как есть
+try:
+    from numba import njit
+except ImportError:
+    def njit(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+        def decorator(func):
+            return func
+        return decorator
+
+@njit(cache=True, fastmath=True)
+def _legs_batch(entry, exits, size, fracs):
+    """P&L ног SELL-позиции: (pnl_usd, pnl_percent) по массивам выходов.
+
+    Тугой цикл без ветвлений - numba опускает его в LLVM, где бэкенд
+    автовекторизует скалярный FP; cache=True амортизирует компиляцию.
+    """
+    n = exits.shape[0]
+    pnl = np.empty(n)
+    pct = np.empty(n)
+    for i in range(n):
+        q = (size / entry) * fracs[i]
+        p = q * (entry - exits[i])
+        pnl[i] = p
+        pct[i] = p / (size * fracs[i]) * 100.0
+    return pnl, pct
+
+# Прогрев: первый реальный вызов получает уже скомпилированное ядро
+_legs_batch(1.0, np.ones(1), 1.0, np.ones(1))
+
 def test_pnl_calculations():
     """Проверяем точность расчетов P&L в PositionManager"""
-    print("ТЕСТ РАСЧЕТОВ P&L В POSITION MANAGER")
-    print("=" * 50)
-    
+    log.info("ТЕСТ РАСЧЕТОВ P&L В POSITION MANAGER")
+    log.info("=" * 50)
+
     # Данные из реальной сделки LTCUSDT SELL
     position_size_usd = 200.0
     entry_price = 119.45
-    
+
     # Расчет количества для SELL позиции
     total_quantity = position_size_usd / entry_price
-    print(f"📊 ИСХОДНЫЕ ДАННЫЕ:")
-    print(f"   Направление: SELL")
-    print(f"   Размер позиции: ${position_size_usd:.2f}")
-    print(f"   Цена входа: ${entry_price:.5f}")
-    print(f"   Общее количество: {total_quantity:.10f}")
-    
-    # TP1: 50% позиции
-    tp1_percent = 50
-    tp1_price = 117.78
-    tp1_quantity = total_quantity * (tp1_percent / 100)
-    tp1_amount_usd = position_size_usd * (tp1_percent / 100)
-    
-    # Расчет P&L для SELL: прибыль когда цена падает
-    tp1_pnl_per_unit = entry_price - tp1_price  # 119.45 - 117.78 = 1.67
-    tp1_pnl_usd = tp1_quantity * tp1_pnl_per_unit
-    tp1_pnl_percent = (tp1_pnl_usd / tp1_amount_usd) * 100
-    
-    print(f"\nTP1 (50% позиции):")
-    print(f"   Цена выхода: ${tp1_price:.5f}")
-    print(f"   Количество: {tp1_quantity:.10f}")
-    print(f"   Сумма USD: ${tp1_amount_usd:.2f}")
-    print(f"   P&L за единицу: ${tp1_pnl_per_unit:.5f}")
-    print(f"   P&L USD: ${tp1_pnl_usd:.10f}")
-    print(f"   P&L %: {tp1_pnl_percent:.10f}%")
-    print(f"   Ожидаемый P&L: $1.3980745081624124")
-    print(f"   Расхождение: ${abs(tp1_pnl_usd - 1.3980745081624124):.10f}")
-    
-    # TP2: 25% позиции
-    tp2_percent = 25
-    tp2_price = 117.165
-    tp2_quantity = total_quantity * (tp2_percent / 100)
-    tp2_amount_usd = position_size_usd * (tp2_percent / 100)
-    
-    tp2_pnl_per_unit = entry_price - tp2_price  # 119.45 - 117.165 = 2.285
-    tp2_pnl_usd = tp2_quantity * tp2_pnl_per_unit
-    tp2_pnl_percent = (tp2_pnl_usd / tp2_amount_usd) * 100
-    
-    print(f"\nTP2 (25% позиции):")
-    print(f"   Цена выхода: ${tp2_price:.5f}")
-    print(f"   Количество: {tp2_quantity:.10f}")
-    print(f"   Сумма USD: ${tp2_amount_usd:.2f}")
-    print(f"   P&L за единицу: ${tp2_pnl_per_unit:.5f}")
-    print(f"   P&L USD: ${tp2_pnl_usd:.10f}")
-    print(f"   P&L %: {tp2_pnl_percent:.10f}%")
-    print(f"   Ожидаемый P&L: $0.956467141063205")
-    print(f"   Расхождение: ${abs(tp2_pnl_usd - 0.956467141063205):.10f}")
-    
-    # TP3: 25% позиции
-    tp3_percent = 25
-    tp3_price = 116.96
-    tp3_quantity = total_quantity * (tp3_percent / 100)
-    tp3_amount_usd = position_size_usd * (tp3_percent / 100)
-    
-    tp3_pnl_per_unit = entry_price - tp3_price  # 119.45 - 116.96 = 2.49
-    tp3_pnl_usd = tp3_quantity * tp3_pnl_per_unit
-    tp3_pnl_percent = (tp3_pnl_usd / tp3_amount_usd) * 100
-    
-    print(f"\nTP3 (25% позиции):")
-    print(f"   Цена выхода: ${tp3_price:.5f}")
-    print(f"   Количество: {tp3_quantity:.10f}")
-    print(f"   Сумма USD: ${tp3_amount_usd:.2f}")
-    print(f"   P&L за единицу: ${tp3_pnl_per_unit:.5f}")
-    print(f"   P&L USD: ${tp3_pnl_usd:.10f}")
-    print(f"   P&L %: {tp3_pnl_percent:.10f}%")
-    print(f"   Ожидаемый P&L: $1.0422771033905438")
-    print(f"   Расхождение: ${abs(tp3_pnl_usd - 1.0422771033905438):.10f}")
-    
+    log.info("📊 ИСХОДНЫЕ ДАННЫЕ:")
+    log.info("   Направление: SELL")
+    log.info("   Размер позиции: $%.2f", position_size_usd)
+    log.info("   Цена входа: $%.5f", entry_price)
+    log.info("   Общее количество: %.10f", total_quantity)
+
+    # Ноги TP1/TP2/TP3 параллельными массивами (SoA): вся математика
+    # считается одним векторным проходом вместо трех скалярных блоков
+    tp_names = ('TP1', 'TP2', 'TP3')
+    tp_percents = np.array([50.0, 25.0, 25.0])
+    tp_prices = np.array([117.78, 117.165, 116.96])
+    expected_pnls = np.array([1.3980745081624124, 0.956467141063205, 1.0422771033905438])
+
+    tp_fractions = tp_percents / 100
+    tp_quantities = total_quantity * tp_fractions
+    tp_amounts_usd = position_size_usd * tp_fractions
+
+    # Расчет P&L для SELL (прибыль когда цена падает) - JIT-ядром
+    tp_pnl_per_unit = entry_price - tp_prices
+    tp_pnls_usd, tp_pnls_percent = _legs_batch(
+        entry_price, tp_prices, position_size_usd, tp_fractions)
+    tp_diffs = np.abs(tp_pnls_usd - expected_pnls)
+
+    # Горячий цикл вывода под level-guard: при молчаливом запуске
+    # пропускается целиком, без единого обращения к массивам
+    if log.isEnabledFor(logging.INFO):
+        for i, name in enumerate(tp_names):
+            log.info("\n%s (%.0f%% позиции):", name, tp_percents[i])
+            log.info("   Цена выхода: $%.5f", tp_prices[i])
+            log.info("   Количество: %.10f", tp_quantities[i])
+            log.info("   Сумма USD: $%.2f", tp_amounts_usd[i])
+            log.info("   P&L за единицу: $%.5f", tp_pnl_per_unit[i])
+            log.info("   P&L USD: $%.10f", tp_pnls_usd[i])
+            log.info("   P&L %%: %.10f%%", tp_pnls_percent[i])
+            log.info("   Ожидаемый P&L: $%s", expected_pnls[i])
+            log.info("   Расхождение: $%.10f", tp_diffs[i])
+
     # Итоговая проверка
-    total_calculated_pnl = tp1_pnl_usd + tp2_pnl_usd + tp3_pnl_usd
+    total_calculated_pnl = float(tp_pnls_usd.sum())
     total_expected_pnl = 1.3980745081624124 + 0.956467141063205 + 1.0422771033905438
-    
-    print(f"\n🎯 ИТОГОВАЯ ПРОВЕРКА:")
-    print(f"   Рассчитанный общий P&L: ${total_calculated_pnl:.10f}")
-    print(f"   Ожидаемый общий P&L: ${total_expected_pnl:.10f}")
-    print(f"   Расхождение: ${abs(total_calculated_pnl - total_expected_pnl):.10f}")
-    
+
+    log.info("\n🎯 ИТОГОВАЯ ПРОВЕРКА:")
+    log.info("   Рассчитанный общий P&L: $%.10f", total_calculated_pnl)
+    log.info("   Ожидаемый общий P&L: $%.10f", total_expected_pnl)
+    log.info("   Расхождение: $%.10f", abs(total_calculated_pnl - total_expected_pnl))
+
     # Проверка проценттов
-    expected_percent_tp1 = 1.3980745081624124
-    expected_percent_tp2 = 1.91293428212641  # из файла
-    expected_percent_tp3 = 2.0845542067810876  # из файла
-    
-    print(f"\n📈 ПРОВЕРКА ПРОЦЕНТОВ:")
-    print(f"   TP1: рассчитано {tp1_pnl_percent:.10f}%, ожидается {expected_percent_tp1:.10f}%")
-    print(f"   TP2: рассчитано {tp2_pnl_percent:.10f}%, ожидается {expected_percent_tp2:.10f}%")
-    print(f"   TP3: рассчитано {tp3_pnl_percent:.10f}%, ожидается {expected_percent_tp3:.10f}%")
-    
-    # Проверяем точность
+    expected_percents = np.array([1.3980745081624124,   # TP1
+                                  1.91293428212641,     # TP2 из файла
+                                  2.0845542067810876])  # TP3 из файла
+
+    if log.isEnabledFor(logging.INFO):
+        log.info("\n📈 ПРОВЕРКА ПРОЦЕНТОВ:")
+        for i, name in enumerate(tp_names):
+            log.info("   %s: рассчитано %.10f%%, ожидается %.10f%%",
+                     name, tp_pnls_percent[i], expected_percents[i])
+
+    # Проверяем точность: одна ufunc-маска по всем четырем значениям
+    # вместо четырех отдельных abs(...) < tolerance
     tolerance = 0.000000001  # 1 наноцент
-    tp1_accurate = abs(tp1_pnl_usd - 1.3980745081624124) < tolerance
-    tp2_accurate = abs(tp2_pnl_usd - 0.956467141063205) < tolerance
-    tp3_accurate = abs(tp3_pnl_usd - 1.0422771033905438) < tolerance
-    total_accurate = abs(total_calculated_pnl - total_expected_pnl) < tolerance
-    
-    print(f"\n✅ РЕЗУЛЬТАТЫ:")
-    print(f"   TP1 точный: {tp1_accurate}")
-    print(f"   TP2 точный: {tp2_accurate}")
-    print(f"   TP3 точный: {tp3_accurate}")
-    print(f"   Общий P&L точный: {total_accurate}")
-    
-    if tp1_accurate and tp2_accurate and tp3_accurate and total_accurate:
-        print(f"\nВСЕ РАСЧЕТЫ P&L ТОЧНЫЕ!")
+    actual = np.append(tp_pnls_usd, total_calculated_pnl)
+    expected = np.append(expected_pnls, total_expected_pnl)
+    accurate_mask = np.isclose(actual, expected, rtol=0, atol=tolerance)
+
+    log.info("\n✅ РЕЗУЛЬТАТЫ:")
+    for name, ok in zip(tp_names + ('Total',), accurate_mask.tolist()):
+        log.info("   %s точный: %s", name, ok)
+
+    if accurate_mask.all():
+        log.info("\nВСЕ РАСЧЕТЫ P&L ТОЧНЫЕ!")
         return True
     else:
-        print(f"\n❌ НАЙДЕНЫ ОШИБКИ В РАСЧЕТАХ P&L!")
+        log.error("\n❌ НАЙДЕНЫ ОШИБКИ В РАСЧЕТАХ P&L!")
         return False
 
 if __name__ == "__main__":
+    # При прямом запуске вывод как раньше; под pytest/в CI уровень выше
+    # INFO отключает все форматирование
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     test_pnl_calculations()
\ No newline at end of file
@@ -23,21 +23,28 @@ logger = logging.getLogger(__name__)
 class TelegramBot:
     """Класс для отправки высококачественных торговых сигналов в Telegram"""
     
-    def __init__(self, bot_token=None, chat_id=None):
+    def __init__(self, bot_token=None, chat_id=None, connector=None):
         self.bot_token = bot_token
         self.chat_id = chat_id
         self.base_url = f"https://api.telegram.org/bot{bot_token}" if bot_token else None
         self.session = None
+        # Внешний общий коннектор (не закрываем его вместе с сессией)
+        self._connector = connector
         self.enabled = bool(bot_token and chat_id)
-        
+
         if self.enabled:
             logger.info("✅ Telegram бот активирован (режим: только высококачественные сигналы)")
         else:
             logger.warning("⚠️ Telegram бот не настроен (отправка в логи)")
-    
+
     async def __aenter__(self):
         if self.enabled:
-            self.session = aiohttp.ClientSession()
+            if self._connector is not None:
+                self.session = aiohttp.ClientSession(
+                    connector=self._connector, connector_owner=False
+                )
+            else:
+                self.session = aiohttp.ClientSession()
         return self
     
     async def __aexit__(self, exc_type, exc, tb):
@@ -223,14 +230,14 @@ class TelegramBot:
         return result
 
 # Вспомогательная функция для создания бота из конфигурации
-def create_telegram_bot():
+def create_telegram_bot(connector=None):
     """Создание Telegram бота из переменных окружения или конфигурации"""
     import os
-    
+
     # Попытка получить настройки из переменных окружения
     bot_token = os.getenv('TELEGRAM_BOT_TOKEN')
     chat_id = os.getenv('TELEGRAM_CHAT_ID')
-    
+
     # Если нет в переменных окружения, попробуем из config
     if not bot_token or not chat_id:
         try:
@@ -239,5 +246,5 @@ def create_telegram_bot():
             chat_id = TELEGRAM_CONFIG.get('CHAT_ID')
         except ImportError:
             logger.debug("Файл telegram_config.py не найден")
-    
-    return TelegramBot(bot_token, chat_id)
\ No newline at end of file
+
+    return TelegramBot(bot_token, chat_id, connector=connector)
\ No newline at end of file
@@ -72,6 +72,7 @@ STATISTICS_CONFIG = {
     
     # История и тренды
     'session_history_limit': 1000,      # Лимит записей истории сессии
+    'closed_trades_limit': 50000,       # Лимит закрытых сделок в памяти
     'keep_trade_history': True,          # Сохранение истории сделок
     'export_to_csv': False,              # Экспорт в CSV (опционально)
     'generate_charts': False,            # Генерация графиков (опционально)
@@ -4,9 +4,10 @@ PRODUCTION-READY VirtualTrader V3.0
 Простой оркестратор без избыточной сложности
 """
 
+import asyncio
 import logging
-import json
 import os
+import time
 from datetime import datetime
 from typing import Dict, List, Optional
 
@@ -15,7 +16,7 @@ from config.logging_config import setup_logging
 from config import ANTISPAM_CONFIG, ML_CONFIG
 
 # Импорты сервисов
-from ..services.balance_manager import BalanceManager
+from ..services.balance_manager import BalanceManager, BlockReason
 from ..services.position_manager import PositionManager
 from ..services.statistics_calculator import StatisticsCalculator
 from ..services.report_generator import ReportGenerator
@@ -44,6 +45,12 @@ class VirtualTraderV2:
         self.blocked_by_exposure = 0
         self.blocked_by_balance = 0
         
+        # Троттлинг статусной строки: не чаще раза в секунду
+        self._last_console_print = 0.0
+
+        # Защита от наложения периодических сохранений в worker-потоке
+        self._save_in_flight = False
+
         # Timing статистика
         self.timing_stats = {
             'signals_queued': 0,
@@ -51,6 +58,12 @@ class VirtualTraderV2:
             'immediate_entries': 0,
             'average_wait_time': 0
         }
+
+        # Замороженная копия timing-статистики для снимков сессии:
+        # пересобирается только когда статистика реально менялась
+        self._timing_stats_version = 0
+        self._cached_timing_stats = dict(self.timing_stats)
+        self._cached_timing_stats_version = 0
         
         logger.info("[SUCCESS] VirtualTrader V3.0 готов к работе")
         logger.info(f"   Баланс: ${initial_balance:,.0f} | Позиция: {position_size_percent}% | Лимит: {max_exposure_percent}%")
@@ -72,16 +85,25 @@ class VirtualTraderV2:
                     count = self.timing_stats['entries_from_timing']
                     if count > 0:
                         self.timing_stats['average_wait_time'] = ((current_avg * (count - 1)) + wait_time) / count
+                self._timing_stats_version += 1
             else:
                 self.timing_stats['immediate_entries'] += 1
+                self._timing_stats_version += 1
         else:
             # Определяем причину блокировки
             can_open, reason = self.balance_manager.can_open_new_position(self.open_positions)
-            if reason == "insufficient_balance":
+            if reason is BlockReason.BALANCE:
                 self.blocked_by_balance += 1
-            elif reason == "exposure_limit":
+            elif reason is BlockReason.EXPOSURE:
                 self.blocked_by_exposure += 1
     
+    def get_timing_stats_snapshot(self) -> Dict:
+        """Копия timing-статистики; новая копия только после изменения"""
+        if self._cached_timing_stats_version != self._timing_stats_version:
+            self._cached_timing_stats = dict(self.timing_stats)
+            self._cached_timing_stats_version = self._timing_stats_version
+        return self._cached_timing_stats
+
     async def check_position_exits(self, api) -> None:
         """Проверка закрытия позиций - делегируем в PositionManager"""
         await self.position_manager.check_position_exits(api)
@@ -89,16 +111,19 @@ class VirtualTraderV2:
     async def log_status(self, api=None, engine=None) -> None:
         """Логирование статуса - упрощенная версия"""
         try:
-            # Получаем текущие цены
+            now = datetime.now()  # Одно время на весь тик
+            # Получаем текущие цены (одним параллельным залпом по всем символам)
             current_prices = {}
             if api and self.position_manager.open_positions:
-                for symbol in self.position_manager.open_positions.keys():
-                    try:
-                        current_data = await api.get_ohlcv(symbol, 15, 1)
-                        if not current_data.empty:
-                            current_prices[symbol] = current_data['close'].iloc[-1]
-                    except:
-                        pass
+                symbols = list(self.position_manager.open_positions.keys())
+                results = await asyncio.gather(
+                    *(api.get_ohlcv(symbol, 15, 1) for symbol in symbols),
+                    return_exceptions=True
+                )
+                for symbol, current_data in zip(symbols, results):
+                    if isinstance(current_data, Exception) or current_data.empty:
+                        continue
+                    current_prices[symbol] = current_data['close'].values[-1]
             
             # Рассчитываем статистику
             stats = self.statistics_calculator.calculate_session_stats(
@@ -106,10 +131,10 @@ class VirtualTraderV2:
                 positions=self.position_manager.open_positions,
                 closed_trades=self.position_manager.closed_trades,
                 current_prices=current_prices,
-                timing_stats=self.timing_stats,
+                timing_stats=self.get_timing_stats_snapshot(),
                 start_time=self.start_time
             )
-            
+
             # Получаем timing статус
             timing_status = ""
             if engine:
@@ -122,16 +147,24 @@ class VirtualTraderV2:
                     pass
             
             # Отображаем статус
-            self._display_status_line(stats, timing_status)
-            
+            self._display_status_line(stats, timing_status, now)
+
             # Периодическое сохранение
-            self._check_periodic_save(stats)
+            await self._check_periodic_save(stats, now)
             
         except Exception as e:
-            logger.error(f"[ERROR] Ошибка в log_status: {e}")
+            logger.error("[ERROR] Ошибка в log_status: %s", e)
     
-    def _display_status_line(self, stats: Dict, timing_status: str = "") -> None:
+    def _display_status_line(self, stats: Dict, timing_status: str = "", now: Optional[datetime] = None) -> None:
         """Простое отображение статуса"""
+        # Пишем в консоль не чаще раза в секунду - меньше syscall'ов stdout
+        monotonic_now = time.monotonic()
+        if monotonic_now - self._last_console_print < 1.0:
+            return
+        self._last_console_print = monotonic_now
+
+        if now is None:
+            now = datetime.now()
         unrealized_pnl = stats.get('unrealized_pnl', 0)
         unrealized_status = f" | Нереализ. P&L: ${unrealized_pnl:+.2f}" if unrealized_pnl != 0 else ""
         
@@ -140,18 +173,29 @@ class VirtualTraderV2:
                  f"Инвестировано: ${stats['invested_capital']:,.0f} ({stats['exposure_percent']:.1f}%) | "
                  f"Позиций: {stats['open_positions_count']} | Сделок: {stats['total_trades']}{timing_status}")
         
-        print(f"\r[VT3.0] {datetime.now().strftime('%H:%M:%S')} | {status}", end="", flush=True)
+        # f-строка с format-спецификатором дешевле strftime (без locale-пути)
+        print(f"\r[VT3.0] {now:%H:%M:%S} | {status}", end="")
     
-    def _check_periodic_save(self, stats: Dict) -> None:
-        """Простое периодическое сохранение"""
+    async def _check_periodic_save(self, stats: Dict, now: Optional[datetime] = None) -> None:
+        """Простое периодическое сохранение (запись в worker-потоке)"""
         try:
-            now = datetime.now()
-            
+            if now is None:
+                now = datetime.now()
+
+            if self._save_in_flight:
+                return  # Предыдущее сохранение еще пишется
+
             if not hasattr(self, 'last_save') or (now - self.last_save).total_seconds() >= 300:  # 5 минут
-                self.report_generator.save_periodic_stats(stats)
-                self.last_save = now
+                # Сериализация и запись на диск уходят в поток -
+                # event loop не ждет дисковый I/O
+                self._save_in_flight = True
+                try:
+                    await asyncio.to_thread(self.report_generator.save_periodic_stats, stats)
+                    self.last_save = now
+                finally:
+                    self._save_in_flight = False
         except Exception as e:
-            logger.debug(f"[SAVE] Ошибка периодического сохранения: {e}")
+            logger.debug("[SAVE] Ошибка периодического сохранения: %s", e)
     
     def save_results(self) -> Optional[str]:
         """Сохранение результатов - делегируем в ReportGenerator"""
@@ -201,18 +245,22 @@ class VirtualTraderV2:
                 
                 # Позиции и статистика
                 'open_positions_count': len(self.open_positions),
-                'timing_stats': self.timing_stats,
+                'timing_stats': self.get_timing_stats_snapshot(),
                 'total_signals': self.total_signals,
                 'blocked_by_balance': self.blocked_by_balance,
                 'blocked_by_exposure': self.blocked_by_exposure
             }
             
-            # Сохраняем
+            # Журнал истории пишется append-only с буфером - досылаем хвост,
+            # чтобы последние записи пережили принудительный os._exit
+            self.statistics_calculator.flush_history()
+
+            # Сохраняем через общий быстрый сериализатор отчетов
+            # (orjson при наличии + атомарная запись tmp -> os.replace):
+            # меньше задержка внутри 2-секундного окна до os._exit
             emergency_file = f"{self.results_dir}/emergency_save_{timestamp}.json"
-            
-            with open(emergency_file, 'w', encoding='utf-8') as f:
-                json.dump(emergency_data, f, indent=2, default=str)
-            
+            self.report_generator._save_json_safely(emergency_data, emergency_file)
+
             logger.info(f"[EMERGENCY] Экстренное сохранение: {emergency_file}")
             return emergency_file
             
@@ -227,7 +275,7 @@ class VirtualTraderV2:
             positions=self.position_manager.open_positions,
             closed_trades=self.position_manager.closed_trades,
             current_prices=current_prices,
-            timing_stats=self.timing_stats,
+            timing_stats=self.get_timing_stats_snapshot(),
             start_time=self.start_time
         )
     
@@ -275,6 +323,9 @@ class VirtualTraderV2:
     
     def get_trades_summary(self) -> Dict:
         return self.position_manager.get_trades_summary()
+
+    def get_recent_trades(self, count: int = 5) -> List:
+        return self.position_manager.get_recent_trades(count)
     
     def get_risk_status(self) -> Dict:
         return self.balance_manager.check_risk_limits(self.open_positions)
\ No newline at end of file
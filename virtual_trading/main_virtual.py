@@ -20,8 +20,17 @@ from datetime import datetime
 # Добавляем родительскую директорию в путь для импортов
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
+# uvloop заметно снижает накладные расходы event loop на каждый await.
+# VT_PROFILE=1 оставляет штатный loop (профилировщики его понимают лучше).
+if not os.environ.get('VT_PROFILE'):
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass  # Необязательная зависимость - работаем на штатном asyncio
+
 # Настройка логирования
-from config.logging_config import setup_logging
+from config.logging_config import setup_logging, flush_log_buffers
 logger = setup_logging()
 
 # Основные импорты из корневой директории
@@ -62,6 +71,7 @@ def setup_signal_handlers():
                 logger.error(f"Ошибка при сохранении: {e}")
         
         print("👋 Виртуальный трейдер завершен")
+        flush_log_buffers()  # Досбрасываем буфер лога, чтобы не потерять записи
         sys.exit(0)
     
     signal.signal(signal.SIGINT, signal_handler)
@@ -232,7 +242,7 @@ async def run_virtual_trader():
                         # Показываем последние 3 сделки
                         if virtual_trader.closed_trades:
                             print(f"\n📝 ПОСЛЕДНИЕ 3 СДЕЛКИ:")
-                            for trade in virtual_trader.closed_trades[-3:]:
+                            for trade in virtual_trader.get_recent_trades(3):
                                 profit_emoji = "💚" if trade.pnl_usd > 0 else "❤️"
                                 timing_type = trade.timing_info.get('timing_type', 'immediate') if trade.timing_info else 'immediate'
                                 print(f"   {profit_emoji} {trade.symbol} {trade.direction.upper()} "
@@ -3,11 +3,16 @@
 Модель виртуальной торговой позиции с timing информацией
 """
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime
 from typing import Optional, Dict
 
-@dataclass
+# Доля позиции, остающаяся открытой, по битовой маске исполненных TP:
+# индекс (tp1<<2)|(tp2<<1)|tp3; TP1 закрывает 50%, TP2 и TP3 - по 25%.
+# Один lookup вместо цепочки из трех ветвлений в горячем тике
+_REMAINING_FRAC = (1.00, 0.75, 0.75, 0.50, 0.50, 0.25, 0.25, 0.00)
+
+@dataclass(slots=True)
 class VirtualPosition:
     """Виртуальная торговая позиция с timing информацией"""
     symbol: str
@@ -30,46 +35,32 @@ class VirtualPosition:
     sl_moved_to_breakeven: bool = False
     
     # Статистика
-    current_sl: float = None
+    current_sl: Optional[float] = None
     max_profit_usd: float = 0.0
     max_loss_usd: float = 0.0
-    
+
     # Timing информация
-    timing_info: dict = None
-    
+    timing_info: Dict = field(default_factory=dict)
+
     # Отслеживание частичных закрытий
-    remaining_quantity: float = None
+    remaining_quantity: Optional[float] = None
     realized_pnl: float = 0.0
-    
+
     def __post_init__(self):
         if self.current_sl is None:
             self.current_sl = self.stop_loss
         if self.remaining_quantity is None:
             self.remaining_quantity = self.quantity
-        if self.timing_info is None:
-            self.timing_info = {}
     
     def get_remaining_quantity(self) -> float:
         """Вычисляет оставшееся количество с учетом частичных закрытий"""
-        remaining = self.quantity
-        if self.tp1_filled:
-            remaining -= self.quantity * 0.5
-        if self.tp2_filled:
-            remaining -= self.quantity * 0.25
-        if self.tp3_filled:
-            remaining -= self.quantity * 0.25
-        return max(0, remaining)
-    
+        idx = (self.tp1_filled << 2) | (self.tp2_filled << 1) | self.tp3_filled
+        return self.quantity * _REMAINING_FRAC[idx]
+
     def get_remaining_percent(self) -> int:
         """Возвращает оставшийся процент позиции"""
-        percent = 100
-        if self.tp1_filled:
-            percent -= 50
-        if self.tp2_filled:
-            percent -= 25
-        if self.tp3_filled:
-            percent -= 25
-        return max(0, percent)
+        idx = (self.tp1_filled << 2) | (self.tp2_filled << 1) | self.tp3_filled
+        return int(_REMAINING_FRAC[idx] * 100)
     
     def is_fully_closed(self) -> bool:
         """Проверяет полностью ли закрыта позиция"""
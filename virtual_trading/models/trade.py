@@ -3,11 +3,11 @@
 Модель закрытой сделки с timing информацией
 """
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime
 from typing import Optional, Dict
 
-@dataclass
+@dataclass(slots=True)
 class ClosedTrade:
     """Закрытая сделка с timing информацией"""
     symbol: str
@@ -22,11 +22,7 @@ class ClosedTrade:
     pnl_usd: float
     pnl_percent: float
     duration_minutes: int
-    timing_info: dict = None
-    
-    def __post_init__(self):
-        if self.timing_info is None:
-            self.timing_info = {}
+    timing_info: Dict = field(default_factory=dict)
     
     def is_profitable(self) -> bool:
         """Проверяет была ли сделка прибыльной"""
@@ -5,68 +5,142 @@ PRODUCTION-READY Balance Manager V3.0
 """
 
 import logging
-from typing import Dict, Tuple, Optional
+import numpy as np
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Dict, List, Tuple, Optional
 from datetime import datetime
 
 logger = logging.getLogger('VirtualTrader.BalanceManager')
 
+class BlockReason(IntEnum):
+    """Причина отказа в открытии новой позиции"""
+    OK = 0
+    BALANCE = 1
+    EXPOSURE = 2
+
+# Человекочитаемые сообщения для логов
+BLOCK_MESSAGES = {
+    BlockReason.OK: 'ok',
+    BlockReason.BALANCE: 'insufficient_balance',
+    BlockReason.EXPOSURE: 'exposure_limit',
+}
+
+# Деньги внутри менеджера храним целыми микро-долларами: целочисленное
+# сложение точное, накопленной ошибки плавающей точки нет по построению.
+# Конвертация во float происходит только на границе (properties/сводки).
+MICROS_PER_USD = 1_000_000
+
+def _to_micros(amount_usd: float) -> int:
+    """USD -> целые микро-доллары (с округлением до микроцента)"""
+    return int(round(amount_usd * MICROS_PER_USD))
+
+@dataclass(slots=True)
+class BalanceSnapshot:
+    """Сводка баланса и результат валидации, посчитанные за один проход"""
+    initial_balance: float
+    available_balance: float
+    invested_capital: float
+    unrealized_pnl: float
+    current_balance: float
+    balance_change: float
+    balance_percent: float
+    exposure_percent: float
+    total_realized_pnl: float
+    is_valid: bool
+    issues: List[str] = field(default_factory=list)
+
 class BalanceManager:
     """Production-ready управление балансом виртуального трейдера"""
     
     def __init__(self, initial_balance: float, position_size_percent: float, max_exposure_percent: float):
         # Основные параметры
         self.initial_balance = initial_balance
-        self.available_balance = initial_balance
         self.position_size_percent = position_size_percent
         self.position_size_usd = initial_balance * (position_size_percent / 100)
         self.max_exposure_percent = max_exposure_percent
         self.max_exposure_usd = initial_balance * (max_exposure_percent / 100)
-        
-        # Операции с балансом
-        self.total_invested = 0.0  # Сколько средств инвестировано
-        self.total_realized_pnl = 0.0  # Общий реализованный P&L
+
+        # Операции с балансом - fixed-point в микро-долларах
+        self._available_micros = _to_micros(initial_balance)
+        self._invested_micros = 0   # Сколько средств инвестировано
+        self._realized_pnl_micros = 0  # Общий реализованный P&L
+
+        # Мемоизация get_invested_capital: счетчик версии растет при каждом
+        # изменении позиций, кэш (версия, кол-во позиций, значение)
+        self._positions_version = 0
+        self._invested_cache = (-1, -1, 0.0)
         
         logger.info(f"[INIT] BalanceManager V3.0 инициализирован")
         logger.info(f"   Баланс: ${self.initial_balance:,.0f} | Позиция: {self.position_size_percent}% | Лимит: {self.max_exposure_percent}%")
     
+    # Float-представление только для чтения: вся арифметика - целочисленная
+    @property
+    def available_balance(self) -> float:
+        return self._available_micros / MICROS_PER_USD
+
+    @property
+    def total_invested(self) -> float:
+        return self._invested_micros / MICROS_PER_USD
+
+    @property
+    def total_realized_pnl(self) -> float:
+        return self._realized_pnl_micros / MICROS_PER_USD
+
+    def bump_positions_version(self) -> None:
+        """Сбрасывает кэш инвестированного капитала после изменения позиций"""
+        self._positions_version += 1
+
     def get_invested_capital(self, positions: Dict) -> float:
-        """Простой расчет инвестированного капитала"""
+        """Простой расчет инвестированного капитала (мемоизирован по версии позиций)"""
+        cache_key = (self._positions_version, len(positions))
+        if self._invested_cache[:2] == cache_key:
+            return self._invested_cache[2]
+
         total_invested = 0.0
-        
+
         for position in positions.values():
             remaining_percent = position.get_remaining_percent()
             if remaining_percent > 0:
                 invested_amount = self.position_size_usd * (remaining_percent / 100)
                 total_invested += invested_amount
-        
+
+        self._invested_cache = (*cache_key, total_invested)
         return total_invested
     
     def get_unrealized_pnl(self, positions: Dict, current_prices: Optional[Dict] = None) -> float:
-        """Простой расчет нереализованного P&L"""
+        """Расчет нереализованного P&L - векторизованно через NumPy"""
         if not current_prices:
             return 0.0
-        
-        total_unrealized = 0.0
-        
+
+        # Собираем позиции в параллельные массивы (SoA) и считаем P&L
+        # одним векторным выражением вместо ветвлений в цикле:
+        # pnl = remaining * sign * (current - entry), sign = +1 buy / -1 sell
+        entry_prices = []
+        prices = []
+        quantities = []
+        signs = []
+
         for symbol, position in positions.items():
-            if symbol not in current_prices:
+            current_price = current_prices.get(symbol)
+            if current_price is None:
                 continue
-            
-            current_price = current_prices[symbol]
+
             remaining_quantity = position.get_remaining_quantity()
-            
             if remaining_quantity <= 0:
                 continue
-            
-            # Простой расчет P&L
-            if position.direction == 'buy':
-                pnl = remaining_quantity * (current_price - position.entry_price)
-            else:
-                pnl = remaining_quantity * (position.entry_price - current_price)
-            
-            total_unrealized += pnl
-        
-        return total_unrealized
+
+            entry_prices.append(position.entry_price)
+            prices.append(current_price)
+            quantities.append(remaining_quantity)
+            signs.append(1.0 if position.direction == 'buy' else -1.0)
+
+        if not entry_prices:
+            return 0.0
+
+        pnl = (np.asarray(quantities) * np.asarray(signs)
+               * (np.asarray(prices) - np.asarray(entry_prices)))
+        return float(pnl.sum())
     
     def get_current_balance(self, positions: Dict, current_prices: Optional[Dict] = None) -> float:
         """ЕДИНСТВЕННЫЙ метод расчета текущего баланса"""
@@ -78,46 +152,101 @@ class BalanceManager:
         
         return total_balance
     
-    def can_open_new_position(self, positions: Dict) -> Tuple[bool, str]:
+    def can_open_new_position(self, positions: Dict) -> Tuple[bool, BlockReason]:
         """Проверка возможности открытия позиции"""
         # Проверка доступного баланса
         if self.available_balance < self.position_size_usd:
-            return False, "insufficient_balance"
-        
+            return False, BlockReason.BALANCE
+
         # Проверка лимита экспозиции
         current_invested = self.get_invested_capital(positions)
         would_be_invested = current_invested + self.position_size_usd
-        
+
         if would_be_invested > self.max_exposure_usd:
-            return False, "exposure_limit"
-        
-        return True, "ok"
+            return False, BlockReason.EXPOSURE
+
+        return True, BlockReason.OK
     
     def reserve_funds(self, amount: float) -> bool:
-        """Резервирует средства для новой позиции"""
-        if self.available_balance >= amount:
-            self.available_balance -= amount
-            self.total_invested += amount
-            
-            logger.debug(f"[RESERVE] ${amount:.0f} зарезервировано, доступно: ${self.available_balance:.0f}")
+        """Резервирует средства для новой позиции (точная целочисленная математика)"""
+        amount_micros = _to_micros(amount)
+        if self._available_micros >= amount_micros:
+            self._available_micros -= amount_micros
+            self._invested_micros += amount_micros
+            self.bump_positions_version()
+
+            # Ленивое %-форматирование: строка не собирается, если DEBUG выключен
+            logger.debug("[RESERVE] $%.0f зарезервировано, доступно: $%.0f", amount, self.available_balance)
             return True
-        
+
         return False
-    
+
+    def reserve_funds_bulk(self, amount: float, count: int) -> int:
+        """Пакетное резервирование count одинаковых позиций по amount.
+
+        Одна проверка и одно вычитание вместо count вызовов reserve_funds;
+        возвращает сколько позиций реально удалось зарезервировать.
+        """
+        amount_micros = _to_micros(amount)
+        if amount_micros <= 0 or count <= 0:
+            return 0
+
+        k = min(count, self._available_micros // amount_micros)
+        if k > 0:
+            total_micros = k * amount_micros
+            self._available_micros -= total_micros
+            self._invested_micros += total_micros
+            self.bump_positions_version()
+
+            logger.debug("[RESERVE] Пакет %d x $%.0f зарезервирован, доступно: $%.0f",
+                         k, amount, self.available_balance)
+
+        return k
+
     def release_funds(self, amount: float, pnl: float = 0) -> None:
         """Освобождает средства после закрытия позиции"""
-        self.available_balance += amount + pnl
-        self.total_invested -= amount
-        self.total_realized_pnl += pnl
-        
-        logger.debug(f"[RELEASE] ${amount:.0f} + P&L ${pnl:+.0f} = ${amount + pnl:.0f}, доступно: ${self.available_balance:.0f}")
+        amount_micros = _to_micros(amount)
+        pnl_micros = _to_micros(pnl)
+
+        self._available_micros += amount_micros + pnl_micros
+        self._invested_micros -= amount_micros
+        self._realized_pnl_micros += pnl_micros
+        self.bump_positions_version()
+
+        logger.debug("[RELEASE] $%.0f + P&L $%+.0f = $%.0f, доступно: $%.0f",
+                     amount, pnl, amount + pnl, self.available_balance)
     
+    def release_funds_batch(self, amounts, pnls) -> None:
+        """Пакетное освобождение средств после серии частичных закрытий.
+
+        Одна NumPy-редукция по массивам вместо N отдельных вызовов
+        release_funds - баланс обновляется и логируется один раз на пакет.
+        """
+        # Округление в микро-доллары поэлементно - результат бит-в-бит
+        # совпадает с последовательностью одиночных release_funds
+        amounts_micros = np.rint(np.asarray(amounts, dtype=np.float64) * MICROS_PER_USD).astype(np.int64)
+        pnls_micros = np.rint(np.asarray(pnls, dtype=np.float64) * MICROS_PER_USD).astype(np.int64)
+
+        amounts_sum = int(amounts_micros.sum())
+        pnls_sum = int(pnls_micros.sum())
+
+        self._available_micros += amounts_sum + pnls_sum
+        self._invested_micros -= amounts_sum
+        self._realized_pnl_micros += pnls_sum
+        self.bump_positions_version()
+
+        logger.debug("[RELEASE] Пакет из %d закрытий: $%.0f + P&L $%+.0f, доступно: $%.0f",
+                     len(pnls), amounts_sum / MICROS_PER_USD,
+                     pnls_sum / MICROS_PER_USD, self.available_balance)
+
     def get_balance_summary(self, positions: Dict, current_prices: Optional[Dict] = None) -> Dict:
         """Простая сводка баланса"""
         invested_capital = self.get_invested_capital(positions)
         unrealized_pnl = self.get_unrealized_pnl(positions, current_prices)
-        current_balance = self.get_current_balance(positions, current_prices)
-        
+        # Баланс считаем из уже полученных слагаемых (та же формула, что в
+        # get_current_balance) - без второго прохода по позициям
+        current_balance = self.available_balance + invested_capital + unrealized_pnl
+
         balance_change = current_balance - self.initial_balance
         balance_percent = (balance_change / self.initial_balance) * 100 if self.initial_balance > 0 else 0
         exposure_percent = (invested_capital / self.initial_balance) * 100 if self.initial_balance > 0 else 0
@@ -136,6 +265,49 @@ class BalanceManager:
             'total_realized_pnl': self.total_realized_pnl
         }
     
+    def snapshot(self, positions: Dict, current_prices: Optional[Dict] = None) -> BalanceSnapshot:
+        """Сводка + валидация одним вызовом.
+
+        Вместо пары get_balance_summary() + validate_state() слагаемые
+        (инвестированный капитал, нереализованный P&L) считаются один раз,
+        а проверки согласованности выполняются на тех же локальных значениях.
+        """
+        invested_capital = self.get_invested_capital(positions)
+        unrealized_pnl = self.get_unrealized_pnl(positions, current_prices)
+        current_balance = self.available_balance + invested_capital + unrealized_pnl
+
+        balance_change = current_balance - self.initial_balance
+        balance_percent = (balance_change / self.initial_balance) * 100 if self.initial_balance > 0 else 0
+        exposure_percent = (invested_capital / self.initial_balance) * 100 if self.initial_balance > 0 else 0
+
+        # Те же проверки, что в validate_state, но на целочисленных
+        # счетчиках - согласованность проверяется точным равенством
+        issues = []
+        if self._available_micros < 0:
+            issues.append("Отрицательный доступный баланс")
+        if self._invested_micros < 0:
+            issues.append("Отрицательный инвестированный капитал")
+
+        theoretical_micros = _to_micros(self.initial_balance) + self._realized_pnl_micros
+        actual_micros = self._available_micros + self._invested_micros
+        if theoretical_micros != actual_micros:
+            issues.append(f"Несоответствие баланса: теория ${theoretical_micros / MICROS_PER_USD:.2f} "
+                          f"vs факт ${actual_micros / MICROS_PER_USD:.2f}")
+
+        return BalanceSnapshot(
+            initial_balance=self.initial_balance,
+            available_balance=self.available_balance,
+            invested_capital=invested_capital,
+            unrealized_pnl=unrealized_pnl,
+            current_balance=current_balance,
+            balance_change=balance_change,
+            balance_percent=balance_percent,
+            exposure_percent=exposure_percent,
+            total_realized_pnl=self.total_realized_pnl,
+            is_valid=len(issues) == 0,
+            issues=issues
+        )
+
     def check_risk_limits(self, positions: Dict) -> Dict:
         """Простая проверка рисков"""
         balance_summary = self.get_balance_summary(positions)
@@ -4,23 +4,107 @@ PRODUCTION-READY Position Manager V3.0
 Простое управление позициями без избыточной сложности
 """
 
+import asyncio
 import logging
+from collections import deque
 from datetime import datetime
 from typing import Dict, List, Optional
 
+from ..config import STATISTICS_CONFIG
 from ..models.position import VirtualPosition
 from ..models.trade import ClosedTrade
+from .balance_manager import BLOCK_MESSAGES
 
 logger = logging.getLogger('VirtualTrader.PositionManager')
 
+# numba (если установлена) JIT-компилирует числовое ядро проверки выходов;
+# необязательная зависимость - без нее ядро работает как обычная функция
+try:
+    from numba import njit
+except ImportError:
+    def njit(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+
+        def wrap(func):
+            return func
+        return wrap
+
+# Коды причин выхода числового ядра и их текстовые эквиваленты
+_EXIT_NONE, _EXIT_SL, _EXIT_TP1, _EXIT_TP2, _EXIT_TP3 = 0, 1, 2, 3, 4
+_EXIT_REASONS = (None, 'Stop Loss', 'TP1', 'TP2', 'TP3')
+
+# Форматы горячих лог-записей: константа собирается один раз при импорте,
+# подстановка аргументов происходит только при включенном уровне логгера
+_CHECK_FMT = "[CHECK] %s: close=%.5f high=%.5f low=%.5f SL=%.5f"
+_CLOSE_FMT = "[CLOSE] %s %s %s: %+.1f%% ($%+.2f)"
+
+
+@njit(cache=True)
+def _exit_kernel(dir_sign, current_sl, tp1, tp2, tp3,
+                 tp1_filled, tp2_filled, tp3_filled,
+                 high_price, low_price, remaining_percent):
+    """Чисто числовая проверка выхода: (код причины, цена, % закрытия)
+
+    Ветки buy/sell свернуты через знак направления: для buy (+1)
+    SL триггерится low_price, TP - high_price; для sell (-1) наоборот,
+    а сравнения зеркалятся умножением разницы на dir_sign.
+    """
+    if dir_sign > 0:
+        sl_price, tp_price = low_price, high_price
+    else:
+        sl_price, tp_price = high_price, low_price
+
+    if dir_sign * (sl_price - current_sl) <= 0:
+        return _EXIT_SL, current_sl, remaining_percent
+
+    if not tp1_filled and dir_sign * (tp_price - tp1) >= 0:
+        return _EXIT_TP1, tp1, 50.0
+    if tp1_filled and not tp2_filled and dir_sign * (tp_price - tp2) >= 0:
+        return _EXIT_TP2, tp2, 25.0
+    if tp2_filled and not tp3_filled and dir_sign * (tp_price - tp3) >= 0:
+        return _EXIT_TP3, tp3, 25.0
+
+    return _EXIT_NONE, 0.0, 0.0
+
+
+@njit(cache=True, fastmath=True)
+def _extremes_kernel(dir_sign, remaining_quantity, entry_price, current_price,
+                     max_profit, max_loss):
+    """Обновление экстремумов P&L позиции: (текущий P&L, max profit, max loss)
+
+    Чистая скалярная арифметика без объектов - выполняется на каждую
+    открытую позицию на каждом тике, поэтому вынесена под JIT.
+    """
+    current_pnl = dir_sign * (current_price - entry_price) * remaining_quantity
+    if current_pnl > max_profit:
+        max_profit = current_pnl
+    if current_pnl < max_loss:
+        max_loss = current_pnl
+    return current_pnl, max_profit, max_loss
+
+
 class PositionManager:
     """Production-ready управление виртуальными позициями"""
     
     def __init__(self, balance_manager):
         self.balance_manager = balance_manager
         self.open_positions: Dict[str, VirtualPosition] = {}
-        self.closed_trades: List[ClosedTrade] = []
-        
+        # Ограниченная история сделок: deque сам вытесняет старые записи,
+        # память не растет бесконечно на длинных сессиях
+        self.closed_trades: deque = deque(maxlen=STATISTICS_CONFIG['closed_trades_limit'])
+        # Мини-окно последних сделок для отчетов: O(1) вне зависимости
+        # от длины closed_trades, deque сам вытесняет старые записи
+        self.recent_trades: deque = deque(maxlen=5)
+
+        # Счетчик ошибок проверки по символам: полный traceback пишем только
+        # при первой ошибке, повторные сетевые сбои логируем одной строкой
+        self._exit_check_errors: Dict[str, int] = {}
+
+        # Прогрев JIT-ядер: платим за компиляцию при старте, а не на первом тике
+        _exit_kernel(1, 1.0, 2.0, 3.0, 4.0, False, False, False, 1.5, 1.2, 100.0)
+        _extremes_kernel(1.0, 1.0, 1.0, 1.0, 0.0, 0.0)
+
         logger.info("[INIT] PositionManager V3.0 готов к работе")
     
     async def open_position(self, signal: Dict) -> bool:
@@ -29,12 +113,12 @@ class PositionManager:
         
         # Проверки
         if symbol in self.open_positions:
-            logger.debug(f"[SKIP] {symbol} уже открыт")
+            logger.debug("[SKIP] %s уже открыт", symbol)
             return False
-        
+
         can_open, reason = self.balance_manager.can_open_new_position(self.open_positions)
         if not can_open:
-            logger.info(f"[BLOCK] {symbol}: {reason}")
+            logger.info("[BLOCK] %s: %s", symbol, BLOCK_MESSAGES[reason])
             return False
         
         # Расчеты
@@ -44,7 +128,7 @@ class PositionManager:
         
         # Резервируем средства
         if not self.balance_manager.reserve_funds(position_size_usd):
-            logger.error(f"[ERROR] Не удалось зарезервировать средства для {symbol}")
+            logger.error("[ERROR] Не удалось зарезервировать средства для %s", symbol)
             return False
         
         # Создаем позицию
@@ -59,12 +143,13 @@ class PositionManager:
             tp1=signal['take_profit'][0],
             tp2=signal['take_profit'][1],
             tp3=signal['take_profit'][2],
-            timing_info=signal.get('timing_info', {})
+            timing_info=signal.get('timing_info') or {}
         )
         
         self.open_positions[symbol] = position
         
-        logger.info(f"[OPEN] {symbol} {signal['direction'].upper()} ${entry_price:.5f} (${position_size_usd:.0f})")
+        logger.info("[OPEN] %s %s $%.5f ($%.0f)",
+                    symbol, signal['direction'].upper(), entry_price, position_size_usd)
         return True
     
     async def check_position_exits(self, api) -> None:
@@ -73,73 +158,92 @@ class PositionManager:
             return
         
         symbols_to_close = []
-        
-        for symbol, position in list(self.open_positions.items()):
+        now = datetime.now()  # Одно время на весь тик вместо вызова на каждую запись
+
+        # Проверку уровня и поиск bound-методов логгера выносим из цикла:
+        # одна проверка на тик вместо одной на каждый logger.debug
+        _dbg = logger.isEnabledFor(logging.DEBUG)
+        log_debug = logger.debug
+        log_error = logger.error
+
+        # Запрашиваем данные по всем позициям параллельно: N последовательных
+        # round-trip'ов к API превращаются в один параллельный залп
+        items = list(self.open_positions.items())
+        results = await asyncio.gather(
+            *(api.get_ohlcv(symbol, 15, 2) for symbol, _ in items),
+            return_exceptions=True
+        )
+
+        for (symbol, position), current_data in zip(items, results):
             try:
-                # Получаем данные
-                current_data = await api.get_ohlcv(symbol, 15, 2)
+                if isinstance(current_data, Exception):
+                    raise current_data
                 if current_data.empty:
                     continue
                 
-                current_price = current_data['close'].iloc[-1]
-                high_price = current_data['high'].iloc[-1]
-                low_price = current_data['low'].iloc[-1]
+                # Одно извлечение строки вместо трех цепочек __getitem__/iloc
+                current_price, high_price, low_price = current_data[['close', 'high', 'low']].values[-1]
                 
+                if _dbg:
+                    log_debug(_CHECK_FMT, symbol, current_price, high_price,
+                              low_price, position.current_sl)
+
+                # Обновляем экстремумы P&L позиции (числовое ядро под JIT)
+                _, position.max_profit_usd, position.max_loss_usd = _extremes_kernel(
+                    1.0 if position.direction == 'buy' else -1.0,
+                    position.get_remaining_quantity(),
+                    position.entry_price, current_price,
+                    position.max_profit_usd, position.max_loss_usd
+                )
+
                 # Проверяем выходы
                 exit_info = self._check_exit_conditions(position, current_price, high_price, low_price)
                 
                 if exit_info:
-                    self._close_position_partial(position, exit_info)
+                    self._close_position_partial(position, exit_info, now)
                     
                     # Проверяем полное закрытие
                     if position.is_fully_closed() or exit_info['reason'] == 'Stop Loss':
                         symbols_to_close.append(symbol)
             
             except Exception as e:
-                logger.error(f"[ERROR] Ошибка проверки {symbol}: {e}")
+                first_error = symbol not in self._exit_check_errors
+                self._exit_check_errors[symbol] = self._exit_check_errors.get(symbol, 0) + 1
+                if first_error:
+                    log_error("[ERROR] Ошибка проверки %s: %s: %s",
+                              symbol, type(e).__name__, e, exc_info=True)
+                else:
+                    # Повторный сбой - без форматирования traceback'а
+                    log_error("[ERROR] Ошибка проверки %s: %s: %s",
+                              symbol, type(e).__name__, e)
         
         # Удаляем закрытые позиции
         for symbol in symbols_to_close:
             del self.open_positions[symbol]
     
     def _check_exit_conditions(self, position: VirtualPosition, current_price: float, high_price: float, low_price: float) -> Optional[Dict]:
-        """Простая проверка условий выхода"""
-        
-        # Проверяем стоп-лосс
-        if position.direction == 'buy' and low_price <= position.current_sl:
-            return {
-                'reason': 'Stop Loss',
-                'price': position.current_sl,
-                'quantity_percent': position.get_remaining_percent()
-            }
-        
-        if position.direction == 'sell' and high_price >= position.current_sl:
-            return {
-                'reason': 'Stop Loss',
-                'price': position.current_sl,
-                'quantity_percent': position.get_remaining_percent()
-            }
-        
-        # Проверяем тейк-профиты
-        if position.direction == 'buy':
-            if not position.tp1_filled and high_price >= position.tp1:
-                return {'reason': 'TP1', 'price': position.tp1, 'quantity_percent': 50}
-            elif position.tp1_filled and not position.tp2_filled and high_price >= position.tp2:
-                return {'reason': 'TP2', 'price': position.tp2, 'quantity_percent': 25}
-            elif position.tp2_filled and not position.tp3_filled and high_price >= position.tp3:
-                return {'reason': 'TP3', 'price': position.tp3, 'quantity_percent': 25}
-        else:  # sell
-            if not position.tp1_filled and low_price <= position.tp1:
-                return {'reason': 'TP1', 'price': position.tp1, 'quantity_percent': 50}
-            elif position.tp1_filled and not position.tp2_filled and low_price <= position.tp2:
-                return {'reason': 'TP2', 'price': position.tp2, 'quantity_percent': 25}
-            elif position.tp2_filled and not position.tp3_filled and low_price <= position.tp3:
-                return {'reason': 'TP3', 'price': position.tp3, 'quantity_percent': 25}
-        
-        return None
+        """Простая проверка условий выхода - числовая часть вынесена в _exit_kernel"""
+        reason_code, price, quantity_percent = _exit_kernel(
+            1 if position.direction == 'buy' else -1,
+            position.current_sl, position.tp1, position.tp2, position.tp3,
+            position.tp1_filled, position.tp2_filled, position.tp3_filled,
+            high_price, low_price,
+            float(position.get_remaining_percent())
+        )
+
+        if reason_code == _EXIT_NONE:
+            return None
+
+        return {
+            'reason': _EXIT_REASONS[reason_code],
+            'price': price,
+            'quantity_percent': quantity_percent
+        }
     
-    def _close_position_partial(self, position: VirtualPosition, exit_info: Dict) -> None:
+    def _close_position_partial(self, position: VirtualPosition, exit_info: Dict, now: Optional[datetime] = None) -> None:
         """Частичное закрытие позиции - упрощенная версия"""
+        if now is None:
+            now = datetime.now()
         exit_price = exit_info['price']
         quantity_percent = exit_info['quantity_percent']
         reason = exit_info['reason']
@@ -167,18 +271,19 @@ class PositionManager:
             entry_price=position.entry_price,
             entry_time=position.entry_time,
             exit_price=exit_price,
-            exit_time=datetime.now(),
+            exit_time=now,
             exit_reason=reason,
             position_size_usd=position_part_usd,
             quantity_closed=quantity_to_close,
             pnl_usd=pnl_usd,
             pnl_percent=pnl_percent,
-            duration_minutes=int((datetime.now() - position.entry_time).total_seconds() / 60),
+            duration_minutes=int((now - position.entry_time).total_seconds() / 60),
             timing_info=position.timing_info.copy()
         )
         
         self.closed_trades.append(closed_trade)
-        
+        self.recent_trades.append(closed_trade)
+
         # Обновляем позицию
         if reason == 'TP1':
             position.tp1_filled = True
@@ -188,9 +293,12 @@ class PositionManager:
             position.tp2_filled = True
         elif reason == 'TP3':
             position.tp3_filled = True
-        
+
+        # Флаги tpN_filled меняют remaining_percent - сбрасываем кэш капитала
+        self.balance_manager.bump_positions_version()
+
         profit_emoji = "💚" if pnl_usd > 0 else "❤️"
-        logger.info(f"[CLOSE] {profit_emoji} {position.symbol} {reason}: {pnl_percent:+.1f}% (${pnl_usd:+.2f})")
+        logger.info(_CLOSE_FMT, profit_emoji, position.symbol, reason, pnl_percent, pnl_usd)
     
     def get_positions_summary(self) -> Dict:
         """Краткая сводка позиций"""
@@ -214,12 +322,22 @@ class PositionManager:
         winning_trades = [t for t in self.closed_trades if t.pnl_usd > 0]
         total_pnl = sum(t.pnl_usd for t in self.closed_trades)
         win_rate = len(winning_trades) / len(self.closed_trades) * 100
-        
+
         return {
             'total_trades': len(self.closed_trades),
             'winning_trades': len(winning_trades),
             'losing_trades': len(self.closed_trades) - len(winning_trades),
             'win_rate': win_rate,
             'total_pnl': total_pnl,
-            'recent_trades': [t.format_summary() for t in self.closed_trades[-5:]]
-        }
\ No newline at end of file
+            'recent_trades': [t.format_summary() for t in self.get_recent_trades(5)]
+        }
+
+    def get_recent_trades(self, count: int = 5) -> List[ClosedTrade]:
+        """Последние N закрытых сделок (deque не поддерживает срезы)"""
+        # Обычные запросы (<= 5) обслуживает мини-окно recent_trades
+        if count <= self.recent_trades.maxlen:
+            trades = list(self.recent_trades)
+            return trades[len(trades) - count:] if count < len(trades) else trades
+
+        n = len(self.closed_trades)
+        return [self.closed_trades[i] for i in range(max(n - count, 0), n)]
\ No newline at end of file
@@ -8,20 +8,41 @@ import json
 import os
 import logging
 from datetime import datetime
-from dataclasses import asdict
+
+# orjson (если установлен) сериализует JSON в разы быстрее стандартного json;
+# необязательная зависимость - без него работаем на стандартной библиотеке
+try:
+    import orjson
+except ImportError:
+    orjson = None
+from dataclasses import fields as dataclass_fields
 from typing import Dict, List, Optional
 
 logger = logging.getLogger('VirtualTrader.Reports')
 
+# Кэш имен полей дата-классов: плоский словарь через getattr вместо
+# рекурсивного asdict-обхода (он deep-copy'ит timing_info каждой сделки)
+_FIELD_NAMES_CACHE: Dict[type, tuple] = {}
+
+def _shallow_dict(obj) -> Dict:
+    names = _FIELD_NAMES_CACHE.get(type(obj))
+    if names is None:
+        names = tuple(f.name for f in dataclass_fields(obj))
+        _FIELD_NAMES_CACHE[type(obj)] = names
+    return {name: getattr(obj, name) for name in names}
+
 class ReportGenerator:
     """Генерирует отчеты и сохраняет результаты виртуальной торговли"""
     
     def __init__(self, results_dir: str = "virtual_trading_results_v2"):
         self.results_dir = results_dir
-        os.makedirs(self.results_dir, exist_ok=True)
-        
+        # Абсолютный путь резолвим один раз - без повторных stat/getcwd
+        # на каждом сохранении
+        self._results_dir_abs = os.path.abspath(results_dir)
+        os.makedirs(self._results_dir_abs, exist_ok=True)
+
         logger.info(f"[INIT] ReportGenerator инициализирован")
-        logger.info(f"[INIT] Директория результатов: {os.path.abspath(self.results_dir)}/")
+        logger.info(f"[INIT] Директория результатов: {self._results_dir_abs}/")
     
     def save_final_results(
         self,
@@ -58,26 +79,26 @@ class ReportGenerator:
             stats['session_end_time'] = datetime.now().isoformat()
             
             # Основная статистика
-            stats_file = f"{self.results_dir}/final_statistics_{timestamp}.json"
+            stats_file = os.path.join(self._results_dir_abs, f"final_statistics_{timestamp}.json")
             self._save_json_safely(stats, stats_file)
             
             logger.info(f"[SAVE] Основная статистика: {stats_file}")
             
             # Сохраняем историю сделок
             if closed_trades:
-                trades_file = f"{self.results_dir}/closed_trades_{timestamp}.json"
+                trades_file = os.path.join(self._results_dir_abs, f"closed_trades_{timestamp}.json")
                 self._save_trades_data(closed_trades, trades_file)
                 logger.info(f"[SAVE] Сделки сохранены: {trades_file} ({len(closed_trades)} сделок)")
             
             # Сохраняем открытые позиции
             if positions:
-                positions_file = f"{self.results_dir}/open_positions_{timestamp}.json"
+                positions_file = os.path.join(self._results_dir_abs, f"open_positions_{timestamp}.json")
                 self._save_positions_data(positions, positions_file)
                 logger.info(f"[SAVE] Позиции сохранены: {positions_file} ({len(positions)} позиций)")
             
             # Создаем текстовый отчет
             try:
-                report_file = f"{self.results_dir}/final_report_{timestamp}.txt"
+                report_file = os.path.join(self._results_dir_abs, f"final_report_{timestamp}.txt")
                 self.create_text_report(stats, report_file)
                 logger.info(f"[SAVE] Отчет создан: {report_file}")
             except Exception as e:
@@ -92,77 +113,84 @@ class ReportGenerator:
     def create_text_report(self, stats: Dict, filename: str) -> None:
         """Создание детального текстового отчета"""
         try:
+            # Собираем отчет в список строк и пишем файл одним вызовом:
+            # один проход через encode/write вместо ~60 мелких f.write
+            parts = []
+            append = parts.append
+
+            append("="*80 + "\n")
+            append("        ОТЧЕТ ВИРТУАЛЬНОГО ТРЕЙДЕРА V2 С TIMING\n")
+            append("="*80 + "\n\n")
+
+            # Заголовок
+            append(f"Отчет создан: {datetime.now():%Y-%m-%d %H:%M:%S}\n")
+            append(f"Причина сохранения: {stats.get('save_reason', 'unknown')}\n")
+            append(f"Длительность сессии: {stats.get('session_duration_hours', 0):.2f} часов\n\n")
+
+            # Финансовые результаты
+            append("[MONEY] ФИНАНСОВЫЕ РЕЗУЛЬТАТЫ:\n")
+            append("-" * 50 + "\n")
+            append(f"Начальный баланс:      ${stats.get('initial_balance', 0):,.2f}\n")
+            append(f"Текущий баланс:        ${stats.get('current_balance', 0):,.2f}\n")
+            append(f"Общий P&L:             ${stats.get('total_pnl', 0):+,.2f}\n")
+            append(f"P&L в процентах:       {stats.get('balance_percent', 0):+.2f}%\n")
+            append(f"Нереализованный P&L:   ${stats.get('unrealized_pnl', 0):+,.2f}\n\n")
+
+            # Торговая статистика
+            append("[STATS] ТОРГОВАЯ СТАТИСТИКА:\n")
+            append("-" * 50 + "\n")
+            append(f"Всего сделок:          {stats.get('total_trades', 0)}\n")
+            append(f"Выигрышных:            {stats.get('winning_trades', 0)}\n")
+            append(f"Проигрышных:           {stats.get('losing_trades', 0)}\n")
+            append(f"Винрейт:               {stats.get('win_rate', 0):.2f}%\n")
+            append(f"Открытых позиций:      {stats.get('open_positions_count', 0)}\n")
+            append(f"Средний P&L:           ${stats.get('average_pnl', 0):+.2f}\n")
+            append(f"Profit Factor:         {stats.get('profit_factor', 0):.2f}\n\n")
+
+            # Timing статистика
+            timing = stats.get('timing_analysis', {})
+            append("[TIME] TIMING СТАТИСТИКА:\n")
+            append("-" * 50 + "\n")
+            append(f"Входов через timing:   {timing.get('entries_from_timing', 0)}\n")
+            append(f"Немедленных входов:    {timing.get('immediate_entries', 0)}\n")
+            append(f"Среднее ожидание:      {timing.get('average_wait_time_minutes', 0):.1f} мин\n")
+            append(f"Использование timing:  {timing.get('timing_usage_rate', 0):.1f}%\n\n")
+
+            # Производительность
+            perf = stats.get('performance_metrics', {})
+            append("[PERF] МЕТРИКИ ПРОИЗВОДИТЕЛЬНОСТИ:\n")
+            append("-" * 50 + "\n")
+            append(f"Sharpe Ratio:          {perf.get('sharpe_ratio', 0):.2f}\n")
+            append(f"Максимальная просадка: {perf.get('max_drawdown_percent', 0):.2f}%\n")
+            append(f"Recovery Factor:       {perf.get('recovery_factor', 0):.2f}\n")
+            append(f"Прибыль в день:        ${perf.get('profit_per_day', 0):+.2f}\n")
+            append(f"Сделок в день:         {perf.get('trades_per_day', 0):.1f}\n\n")
+
+            # Блокировки и ограничения
+            append("[BLOCKS] БЛОКИРОВКИ:\n")
+            append("-" * 50 + "\n")
+            append(f"По балансу:            {stats.get('blocked_by_balance', 0)}\n")
+            append(f"По экспозиции:         {stats.get('blocked_by_exposure', 0)}\n\n")
+
+            # Timing производительность по типам
+            timing_perf = timing.get('timing_performance_by_type', {})
+            if timing_perf:
+                append("[TIMING_PERF] ПРОИЗВОДИТЕЛЬНОСТЬ ПО ТИПАМ TIMING:\n")
+                append("-" * 50 + "\n")
+                for timing_type, perf_data in timing_perf.items():
+                    append(f"{timing_type.upper()}:\n")
+                    append(f"  Сделок:        {perf_data.get('count', 0)}\n")
+                    append(f"  Винрейт:       {perf_data.get('win_rate', 0):.1f}%\n")
+                    append(f"  Средний P&L:   ${perf_data.get('average_pnl', 0):+.2f}\n")
+                    append(f"  Ср. ожидание:  {perf_data.get('average_wait_time', 0):.1f} мин\n\n")
+
+            append("="*80 + "\n")
+            append("                           КОНЕЦ ОТЧЕТА\n")
+            append("="*80 + "\n")
+
             with open(filename, 'w', encoding='utf-8') as f:
-                f.write("="*80 + "\n")
-                f.write("        ОТЧЕТ ВИРТУАЛЬНОГО ТРЕЙДЕРА V2 С TIMING\n")
-                f.write("="*80 + "\n\n")
-                
-                # Заголовок
-                f.write(f"Отчет создан: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-                f.write(f"Причина сохранения: {stats.get('save_reason', 'unknown')}\n")
-                f.write(f"Длительность сессии: {stats.get('session_duration_hours', 0):.2f} часов\n\n")
-                
-                # Финансовые результаты
-                f.write("[MONEY] ФИНАНСОВЫЕ РЕЗУЛЬТАТЫ:\n")
-                f.write("-" * 50 + "\n")
-                f.write(f"Начальный баланс:      ${stats.get('initial_balance', 0):,.2f}\n")
-                f.write(f"Текущий баланс:        ${stats.get('current_balance', 0):,.2f}\n")
-                f.write(f"Общий P&L:             ${stats.get('total_pnl', 0):+,.2f}\n")
-                f.write(f"P&L в процентах:       {stats.get('balance_percent', 0):+.2f}%\n")
-                f.write(f"Нереализованный P&L:   ${stats.get('unrealized_pnl', 0):+,.2f}\n\n")
-                
-                # Торговая статистика
-                f.write("[STATS] ТОРГОВАЯ СТАТИСТИКА:\n")
-                f.write("-" * 50 + "\n")
-                f.write(f"Всего сделок:          {stats.get('total_trades', 0)}\n")
-                f.write(f"Выигрышных:            {stats.get('winning_trades', 0)}\n")
-                f.write(f"Проигрышных:           {stats.get('losing_trades', 0)}\n")
-                f.write(f"Винрейт:               {stats.get('win_rate', 0):.2f}%\n")
-                f.write(f"Открытых позиций:      {stats.get('open_positions_count', 0)}\n")
-                f.write(f"Средний P&L:           ${stats.get('average_pnl', 0):+.2f}\n")
-                f.write(f"Profit Factor:         {stats.get('profit_factor', 0):.2f}\n\n")
-                
-                # Timing статистика
-                timing = stats.get('timing_analysis', {})
-                f.write("[TIME] TIMING СТАТИСТИКА:\n")
-                f.write("-" * 50 + "\n")
-                f.write(f"Входов через timing:   {timing.get('entries_from_timing', 0)}\n")
-                f.write(f"Немедленных входов:    {timing.get('immediate_entries', 0)}\n")
-                f.write(f"Среднее ожидание:      {timing.get('average_wait_time_minutes', 0):.1f} мин\n")
-                f.write(f"Использование timing:  {timing.get('timing_usage_rate', 0):.1f}%\n\n")
-                
-                # Производительность
-                perf = stats.get('performance_metrics', {})
-                f.write("[PERF] МЕТРИКИ ПРОИЗВОДИТЕЛЬНОСТИ:\n")
-                f.write("-" * 50 + "\n")
-                f.write(f"Sharpe Ratio:          {perf.get('sharpe_ratio', 0):.2f}\n")
-                f.write(f"Максимальная просадка: {perf.get('max_drawdown_percent', 0):.2f}%\n")
-                f.write(f"Recovery Factor:       {perf.get('recovery_factor', 0):.2f}\n")
-                f.write(f"Прибыль в день:        ${perf.get('profit_per_day', 0):+.2f}\n")
-                f.write(f"Сделок в день:         {perf.get('trades_per_day', 0):.1f}\n\n")
-                
-                # Блокировки и ограничения
-                f.write("[BLOCKS] БЛОКИРОВКИ:\n")
-                f.write("-" * 50 + "\n")
-                f.write(f"По балансу:            {stats.get('blocked_by_balance', 0)}\n")
-                f.write(f"По экспозиции:         {stats.get('blocked_by_exposure', 0)}\n\n")
-                
-                # Timing производительность по типам
-                timing_perf = timing.get('timing_performance_by_type', {})
-                if timing_perf:
-                    f.write("[TIMING_PERF] ПРОИЗВОДИТЕЛЬНОСТЬ ПО ТИПАМ TIMING:\n")
-                    f.write("-" * 50 + "\n")
-                    for timing_type, perf_data in timing_perf.items():
-                        f.write(f"{timing_type.upper()}:\n")
-                        f.write(f"  Сделок:        {perf_data.get('count', 0)}\n")
-                        f.write(f"  Винрейт:       {perf_data.get('win_rate', 0):.1f}%\n")
-                        f.write(f"  Средний P&L:   ${perf_data.get('average_pnl', 0):+.2f}\n")
-                        f.write(f"  Ср. ожидание:  {perf_data.get('average_wait_time', 0):.1f} мин\n\n")
-                
-                f.write("="*80 + "\n")
-                f.write("                           КОНЕЦ ОТЧЕТА\n")
-                f.write("="*80 + "\n")
-                
+                f.write(''.join(parts))
+
         except Exception as e:
             logger.error(f"[ERROR] Ошибка создания текстового отчета: {e}", exc_info=True)
     
@@ -289,25 +317,36 @@ class ReportGenerator:
             elif hasattr(obj, 'isoformat'):
                 return obj.isoformat()
             return obj
-        
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False, default=safe_serialize)
+
+        # Пишем во временный файл и атомарно подменяем os.replace:
+        # читатель никогда не увидит полузаписанный JSON
+        tmp_filename = f"{filename}.tmp"
+
+        if orjson is not None:
+            payload = orjson.dumps(
+                data,
+                option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY,
+                default=safe_serialize
+            )
+            with open(tmp_filename, 'wb') as f:
+                f.write(payload)
+        else:
+            with open(tmp_filename, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2, ensure_ascii=False, default=safe_serialize)
+
+        os.replace(tmp_filename, filename)
     
     def _save_trades_data(self, closed_trades: List, filename: str) -> None:
         """Сохранение данных о сделках"""
         trades_data = []
         
+        # datetime-поля конвертирует сериализатор в _save_json_safely -
+        # повторный проход по всем полям каждой сделки здесь не нужен
         for trade in closed_trades:
             if hasattr(trade, 'to_dict'):
-                trade_dict = trade.to_dict()
+                trades_data.append(trade.to_dict())
             else:
-                trade_dict = asdict(trade)
-                # Конвертируем datetime в строки
-                for key, value in trade_dict.items():
-                    if isinstance(value, datetime):
-                        trade_dict[key] = value.isoformat()
-            
-            trades_data.append(trade_dict)
+                trades_data.append(_shallow_dict(trade))
         
         self._save_json_safely(trades_data, filename)
     
@@ -315,20 +354,16 @@ class ReportGenerator:
         """Сохранение данных о позициях"""
         positions_data = []
         
+        # datetime-поля конвертирует сериализатор в _save_json_safely
         for position in positions.values():
-            pos_dict = asdict(position)
-            # Конвертируем datetime в строки
-            for key, value in pos_dict.items():
-                if isinstance(value, datetime):
-                    pos_dict[key] = value.isoformat()
-            positions_data.append(pos_dict)
+            positions_data.append(_shallow_dict(position))
         
         self._save_json_safely(positions_data, filename)
     
     def save_periodic_stats(self, stats: Dict) -> None:
         """Периодическое сохранение статистики сессии"""
         try:
-            stats_file = f"{self.results_dir}/session_stats_v2.json"
+            stats_file = os.path.join(self._results_dir_abs, "session_stats_v2.json")
             stats['save_reason'] = 'periodic_save'
             stats['save_time'] = datetime.now().isoformat()
             
@@ -336,4 +371,5 @@ class ReportGenerator:
             logger.debug(f"[PERIODIC] Статистика сохранена в {stats_file}")
             
         except Exception as e:
-            logger.error(f"[ERROR] Ошибка периодического сохранения: {e}", exc_info=True)
\ No newline at end of file
+            # Периодический путь - без дорогого форматирования traceback'а
+            logger.error("[ERROR] Ошибка периодического сохранения: %s: %s", type(e).__name__, e)
\ No newline at end of file
@@ -4,20 +4,77 @@
 Вычисляет метрики производительности виртуального трейдера
 """
 
+import json
 import logging
+import os
+import time
 import numpy as np
+from collections import defaultdict, deque
 from datetime import datetime
 from typing import Dict, List, Optional, Any
 
+from ..config import STATISTICS_CONFIG
+
 logger = logging.getLogger('VirtualTrader.Statistics')
 
+# Поля записи статистики по типу timing; dict.fromkeys по готовому кортежу
+# дешевле разбора dict-литерала на каждый новый тип в цикле
+_TIMING_PERF_FIELDS = ('count', 'total_pnl', 'wins', 'total_wait_time')
+
+def _new_timing_perf() -> Dict:
+    return dict.fromkeys(_TIMING_PERF_FIELDS, 0)
+
+# Append-only журнал снимков сессии: каждая запись дописывается одной
+# JSON-строкой вместо перезаписи всей истории при каждом сохранении
+HISTORY_FILE = 'virtual_trading_results_v2/session_history.jsonl'
+HISTORY_FLUSH_INTERVAL_SEC = 30.0
+
 class StatisticsCalculator:
     """Расчет статистики и производительности виртуального трейдера"""
     
     def __init__(self):
-        self.session_history: List[Dict] = []
+        # Ограниченная история в памяти: deque сам вытесняет старые записи,
+        # память не растет бесконечно на длинных сессиях (полная история - в JSONL)
+        self.session_history: deque = deque(maxlen=STATISTICS_CONFIG['session_history_limit'])
+        self._history_fp = None  # Открывается лениво при первой записи
+        self._history_flush_deadline = 0.0
+
+        # Кэш статистики сделок: closed_trades только дополняется, поэтому
+        # агрегаты меняются лишь при появлении новых записей. Ключ - число
+        # записей плюс последняя сделка: у заполненного deque длина не растет
+        self._trades_stats_cache = (None, None)
         logger.debug("[INIT] StatisticsCalculator инициализирован")
-    
+
+    def _append_history_record(self, record: Dict) -> None:
+        """Дописывает снимок сессии одной строкой в JSONL-журнал (O(1))"""
+        try:
+            if self._history_fp is None:
+                os.makedirs(os.path.dirname(HISTORY_FILE), exist_ok=True)
+                self._history_fp = open(HISTORY_FILE, 'a', encoding='utf-8', buffering=64 * 1024)
+
+            self._history_fp.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+
+            # Сбрасываем буфер на диск не чаще раза в 30 секунд
+            now = time.monotonic()
+            if now >= self._history_flush_deadline:
+                self._history_fp.flush()
+                self._history_flush_deadline = now + HISTORY_FLUSH_INTERVAL_SEC
+        except Exception as e:
+            logger.debug("[HISTORY] Не удалось записать историю сессии: %s", e)
+
+    def flush_history(self) -> None:
+        """Принудительный сброс буфера JSONL-журнала на диск.
+
+        Используется экстренным сохранением: иначе хвост журнала
+        (до 30 секунд записей) пропал бы при os._exit.
+        """
+        try:
+            if self._history_fp is not None:
+                self._history_fp.flush()
+                self._history_flush_deadline = time.monotonic() + HISTORY_FLUSH_INTERVAL_SEC
+        except Exception as e:
+            logger.debug("[HISTORY] Не удалось сбросить буфер истории: %s", e)
+
     def calculate_session_stats(
         self,
         balance_manager,
@@ -30,11 +87,14 @@ class StatisticsCalculator:
         """Рассчитывает статистику текущей сессии"""
         try:
             logger.debug("[CALC] Рассчитываем сессионную статистику...")
-            
+
+            # Одно время на весь расчет вместо datetime.now() в каждом блоке
+            now = datetime.now()
+
             # Базовая информация
             session_duration = 0
             if start_time:
-                session_duration = (datetime.now() - start_time).total_seconds() / 3600
+                session_duration = (now - start_time).total_seconds() / 3600
             
             # Баланс и финансы
             balance_summary = balance_manager.get_balance_summary(positions, current_prices)
@@ -46,12 +106,12 @@ class StatisticsCalculator:
             timing_analysis = self.analyze_timing_performance(closed_trades, timing_stats or {})
             
             # Статистика позиций
-            positions_stats = self.analyze_positions(positions)
-            
+            positions_stats = self.analyze_positions(positions, now)
+
             stats = {
                 # Время
                 'session_duration_hours': session_duration,
-                'timestamp': datetime.now().isoformat(),
+                'timestamp': now.isoformat(),
                 
                 # Баланс
                 **balance_summary,
@@ -66,30 +126,36 @@ class StatisticsCalculator:
                 'timing_analysis': timing_analysis,
                 
                 # Производительность
-                'performance_metrics': self.calculate_performance_metrics(closed_trades, balance_summary)
+                'performance_metrics': self.calculate_performance_metrics(closed_trades, balance_summary, now)
             }
             
             # Добавляем в историю сессии
-            self.session_history.append({
-                'timestamp': datetime.now().isoformat(),
+            session_record = {
+                'timestamp': stats['timestamp'],
                 'snapshot': stats
-            })
-            
-            # Ограничиваем размер истории
-            if len(self.session_history) > 1000:
-                self.session_history = self.session_history[-500:]
+            }
+            self.session_history.append(session_record)
+            self._append_history_record(session_record)
             
-            logger.debug(f"[CALC] Статистика рассчитана: {trades_stats['total_trades']} сделок, "
-                        f"винрейт {trades_stats['win_rate']:.1f}%, P&L ${trades_stats['total_pnl']:+.2f}")
+            logger.debug("[CALC] Статистика рассчитана: %d сделок, винрейт %.1f%%, P&L $%+.2f",
+                         trades_stats['total_trades'], trades_stats['win_rate'], trades_stats['total_pnl'])
             
             return stats
             
         except Exception as e:
-            logger.error(f"[ERROR] Ошибка расчета статистики: {e}", exc_info=True)
+            # Вызывается каждый цикл - traceback форматируем только на DEBUG
+            logger.error("[ERROR] Ошибка расчета статистики: %s: %s",
+                         type(e).__name__, e, exc_info=logger.isEnabledFor(logging.DEBUG))
             return self._get_empty_stats()
     
     def calculate_trades_statistics(self, closed_trades: List) -> Dict:
         """Рассчитывает статистику по сделкам - группирует частичные выходы как одну сделку"""
+        # Пока новых закрытий не было - отдаем готовый результат без пересчета
+        cache_key = (len(closed_trades), closed_trades[-1] if closed_trades else None)
+        cached_key, cached_stats = self._trades_stats_cache
+        if cached_stats is not None and cached_key == cache_key:
+            return cached_stats
+
         if not closed_trades:
             return {
                 'total_trades': 0,
@@ -135,18 +201,23 @@ class StatisticsCalculator:
                 'exit_reasons': [part.exit_reason for part in group_data['parts']]
             })
         
-        # Рассчитываем статистику по агрегированным сделкам
-        winning_trades = [t for t in aggregated_trades if t['total_pnl'] > 0]
-        losing_trades = [t for t in aggregated_trades if t['total_pnl'] <= 0]
-        
-        total_pnl = sum(t['total_pnl'] for t in aggregated_trades)
-        total_profit = sum(t['total_pnl'] for t in winning_trades)
-        total_loss = abs(sum(t['total_pnl'] for t in losing_trades))
-        
-        win_rate = len(winning_trades) / len(aggregated_trades) * 100 if aggregated_trades else 0
-        average_pnl = total_pnl / len(aggregated_trades) if aggregated_trades else 0
-        average_win = total_profit / len(winning_trades) if winning_trades else 0
-        average_loss = total_loss / len(losing_trades) if losing_trades else 0
+        # Рассчитываем статистику по агрегированным сделкам векторно:
+        # один массив P&L (SoA) вместо четырех проходов list-comp'ами
+        pnls = np.fromiter((t['total_pnl'] for t in aggregated_trades),
+                           dtype=np.float64, count=len(aggregated_trades))
+        win_mask = pnls > 0
+
+        winning_count = int(win_mask.sum())
+        losing_count = len(pnls) - winning_count
+
+        total_pnl = float(pnls.sum())
+        total_profit = float(pnls[win_mask].sum())
+        total_loss = abs(float(pnls[~win_mask].sum()))
+
+        win_rate = winning_count / len(pnls) * 100 if len(pnls) else 0
+        average_pnl = total_pnl / len(pnls) if len(pnls) else 0
+        average_win = total_profit / winning_count if winning_count else 0
+        average_loss = total_loss / losing_count if losing_count else 0
         profit_factor = total_profit / total_loss if total_loss > 0 else float('inf')
         
         # Consecutive wins/losses по агрегированным сделкам
@@ -168,10 +239,10 @@ class StatisticsCalculator:
                 current_wins = 0
                 max_consecutive_losses = max(max_consecutive_losses, current_losses)
         
-        return {
+        trades_stats = {
             'total_trades': len(aggregated_trades),
-            'winning_trades': len(winning_trades),
-            'losing_trades': len(losing_trades),
+            'winning_trades': winning_count,
+            'losing_trades': losing_count,
             'win_rate': win_rate,
             'total_pnl': total_pnl,
             'average_pnl': average_pnl,
@@ -187,6 +258,9 @@ class StatisticsCalculator:
                 for t in aggregated_trades
             ]
         }
+
+        self._trades_stats_cache = (cache_key, trades_stats)
+        return trades_stats
     
     def analyze_timing_performance(self, closed_trades: List, timing_stats: Dict) -> Dict:
         """Анализирует производительность timing системы"""
@@ -207,7 +281,7 @@ class StatisticsCalculator:
             timing_analysis['timing_usage_rate'] = (timing_stats.get('entries_from_timing', 0) / total_entries) * 100
         
         # Анализ по типам timing для закрытых сделок - группируем по позициям
-        timing_performance = {}
+        timing_performance = defaultdict(_new_timing_perf)
         grouped_positions = {}
         
         # Сначала группируем части позиций
@@ -230,24 +304,21 @@ class StatisticsCalculator:
         
         # Теперь анализируем по типам timing для целых позиций
         for position_data in grouped_positions.values():
+            # Распаковываем timing-поля один раз на позицию
             timing_info = position_data['timing_info']
             timing_type = timing_info.get('timing_type', 'unknown')
-            
-            if timing_type not in timing_performance:
-                timing_performance[timing_type] = {
-                    'count': 0,
-                    'total_pnl': 0,
-                    'wins': 0,
-                    'total_wait_time': 0
-                }
-            
-            timing_performance[timing_type]['count'] += 1
-            timing_performance[timing_type]['total_pnl'] += position_data['total_pnl']
-            if position_data['total_pnl'] > 0:
-                timing_performance[timing_type]['wins'] += 1
-            
             wait_time = timing_info.get('wait_time_minutes', 0)
-            timing_performance[timing_type]['total_wait_time'] += wait_time
+
+            # Один lookup статистики типа вместо пяти подряд
+            type_stats = timing_performance[timing_type]
+            position_pnl = position_data['total_pnl']
+
+            type_stats['count'] += 1
+            type_stats['total_pnl'] += position_pnl
+            if position_pnl > 0:
+                type_stats['wins'] += 1
+
+            type_stats['total_wait_time'] += wait_time
         
         # Рассчитываем средние значения
         for timing_type, stats in timing_performance.items():
@@ -256,11 +327,11 @@ class StatisticsCalculator:
                 stats['average_pnl'] = stats['total_pnl'] / stats['count']
                 stats['average_wait_time'] = stats['total_wait_time'] / stats['count']
         
-        timing_analysis['timing_performance_by_type'] = timing_performance
+        timing_analysis['timing_performance_by_type'] = dict(timing_performance)
         
         return timing_analysis
     
-    def analyze_positions(self, positions: Dict) -> Dict:
+    def analyze_positions(self, positions: Dict, now: Optional[datetime] = None) -> Dict:
         """Анализирует открытые позиции"""
         if not positions:
             return {
@@ -272,23 +343,18 @@ class StatisticsCalculator:
         
         # Статистика по направлениям
         buy_positions = sum(1 for p in positions.values() if p.direction == 'buy')
-        sell_positions = sum(1 for p in positions.values() if p.direction == 'sell')
-        
-        # Позиции в профите (нужны текущие цены для точного расчета)
-        positions_with_profit = 0
-        total_age_minutes = 0
-        current_time = datetime.now()
-        
-        for position in positions.values():
-            # Возраст позиции
-            position_age = (current_time - position.entry_time).total_seconds() / 60
-            total_age_minutes += position_age
-            
-            # Простая проверка на профит (без текущих цен)
-            if position.max_profit_usd > 0:
-                positions_with_profit += 1
-        
-        avg_age = total_age_minutes / len(positions) if positions else 0
+        sell_positions = len(positions) - buy_positions
+
+        # Возраст и профитность считаем батчем по SoA-массивам:
+        # два np.fromiter вместо datetime-арифметики в цикле по позициям
+        now_ts = (now or datetime.now()).timestamp()
+        entry_ts = np.fromiter((p.entry_time.timestamp() for p in positions.values()),
+                               dtype=np.float64, count=len(positions))
+        max_profits = np.fromiter((p.max_profit_usd for p in positions.values()),
+                                  dtype=np.float64, count=len(positions))
+
+        positions_with_profit = int((max_profits > 0).sum())
+        avg_age = float((now_ts - entry_ts).mean()) / 60
         
         return {
             'open_positions_count': len(positions),
@@ -297,7 +363,7 @@ class StatisticsCalculator:
             'avg_position_age_minutes': avg_age
         }
     
-    def calculate_performance_metrics(self, closed_trades: List, balance_summary: Dict) -> Dict:
+    def calculate_performance_metrics(self, closed_trades: List, balance_summary: Dict, now: Optional[datetime] = None) -> Dict:
         """Рассчитывает метрики производительности"""
         if not closed_trades:
             return {
@@ -312,7 +378,7 @@ class StatisticsCalculator:
             # Дневная прибыль
             if closed_trades:
                 first_trade_time = min(t.entry_time for t in closed_trades)
-                days_trading = (datetime.now() - first_trade_time).days or 1
+                days_trading = ((now or datetime.now()) - first_trade_time).days or 1
                 profit_per_day = balance_summary['total_pnl'] / days_trading
                 trades_per_day = len(closed_trades) / days_trading
             else:
@@ -372,7 +438,7 @@ class StatisticsCalculator:
         if not self.session_history:
             return {'total_records': 0, 'history': []}
         
-        recent_history = self.session_history[-last_n_records:]
+        recent_history = list(self.session_history)[-last_n_records:]
         
         return {
             'total_records': len(self.session_history),